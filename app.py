@@ -1,12 +1,28 @@
 import os
+import io
+import time
+import hmac
+import json
 import logging
-from flask import Flask, request, jsonify, render_template, flash, redirect, url_for
+from datetime import datetime, timezone
+from functools import wraps
+import click
+from flask import Flask, Response, request, jsonify, render_template, flash, redirect, url_for, stream_with_context
 from sheets_service import GoogleSheetsService
 from password_manager import PasswordManager
+from vendor_index import AMBIGUOUS
 from typebot_service import TypebotService
+from inventory_io import FORMATS, parse_records, export_records
+from logging_setup import configure_logging
+from assignment_history import AssignmentHistory
+from profiling import ProfilingController
 
 # Configure logging
-logging.basicConfig(level=logging.DEBUG)
+# Logs vão para uma fila e são formatados/escritos numa thread separada
+configure_logging(
+    level=os.environ.get("LOG_LEVEL", "INFO"),
+    json_output=os.environ.get("LOG_FORMAT", "text").lower() == "json"
+)
 logger = logging.getLogger(__name__)
 
 # Create the Flask app
@@ -62,9 +78,48 @@ sheets_service = GoogleSheetsService(
 
 logger.info(f"Google Sheets service initialized. Demo mode: {sheets_service.demo_mode}")
 
-password_manager = PasswordManager(sheets_service)
+# Aliases opcionais de fornecedores, ex: {"sup": "Senhas : Supervisor"}
+vendor_aliases = {}
+if os.environ.get("VENDOR_ALIASES"):
+    try:
+        vendor_aliases = json.loads(os.environ.get("VENDOR_ALIASES"))
+    except json.JSONDecodeError as e:
+        logger.error(f"Invalid VENDOR_ALIASES JSON: {str(e)}")
+
+# Histórico local de atribuições (SQLite)
+assignment_history = AssignmentHistory(os.environ.get("ASSIGNMENT_HISTORY_DB", "assignment_history.db"))
+
+password_manager = PasswordManager(sheets_service, vendor_aliases=vendor_aliases, history=assignment_history)
 typebot_service = TypebotService()
 
+# Token para endpoints administrativos; sem ele esses endpoints ficam desabilitados
+admin_token = os.environ.get("ADMIN_TOKEN")
+
+def require_admin(view):
+    """Restrict a view to requests carrying the ADMIN_TOKEN (X-Admin-Token or Bearer)."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not admin_token:
+            return jsonify({"error": "Admin endpoints are disabled (ADMIN_TOKEN not set)"}), 403
+        
+        provided = request.headers.get('X-Admin-Token', '')
+        auth_header = request.headers.get('Authorization', '')
+        if not provided and auth_header.startswith('Bearer '):
+            provided = auth_header[len('Bearer '):]
+            
+        if not hmac.compare_digest(provided.encode(), admin_token.encode()):
+            return jsonify({"error": "Unauthorized"}), 401
+        return view(*args, **kwargs)
+    return wrapper
+
+def _inventory_format(default: str = 'csv') -> str:
+    """Pick the inventory format from ?format= or the request Content-Type."""
+    fmt = request.args.get('format')
+    if not fmt:
+        content_type = request.mimetype or ''
+        fmt = 'ndjson' if 'ndjson' in content_type or 'jsonl' in content_type else default
+    return fmt
+
 @app.route('/')
 def index():
     """Display the main dashboard."""
@@ -72,7 +127,7 @@ def index():
         password_stats = password_manager.get_password_statistics()
         
         # Adicionar logs para depuração
-        logger.debug(f"Stats returned: {password_stats}")
+        logger.debug("Stats returned: %s", password_stats)
         
         # Garantir que temos a estrutura correta
         if isinstance(password_stats, dict) and 'vendors' not in password_stats:
@@ -92,6 +147,27 @@ def index():
         }
         return render_template('index.html', stats=empty_stats)
         
+@app.route('/healthz')
+def healthz():
+    """Liveness probe: in-memory state only, never calls Google Sheets."""
+    last_refresh_at = password_manager.last_refresh_at
+    return jsonify({
+        "status": "ok",
+        "snapshot_age_seconds": round(time.time() - last_refresh_at, 3) if last_refresh_at else None,
+        "pending_writes": password_manager.pending_write_count,
+        "last_sheets_error": sheets_service.last_error,
+        "last_sheets_error_at": sheets_service.last_error_at,
+        "demo_mode": sheets_service.demo_mode,
+        "twilio_configured": password_manager.twilio_service.is_configured()
+    })
+
+@app.route('/readyz')
+def readyz():
+    """Readiness probe: ready once the password index has loaded at least once."""
+    if not password_manager.loaded:
+        return jsonify({"status": "not_ready"}), 503
+    return jsonify({"status": "ready"})
+
 @app.route('/typebot-guide')
 def typebot_guide():
     """Display the typebot integration guide."""
@@ -109,13 +185,21 @@ def get_password():
         if not vendor:
             return jsonify({"error": "Vendor parameter is required"}), 400
             
+        match = password_manager.find_vendor(vendor)
+        if match.status == AMBIGUOUS:
+            return jsonify({
+                "error": f"Ambiguous vendor: {vendor}",
+                "candidates": match.candidates
+            }), 409
+            
         # Use the auto-assign functionality to get the next password
         # If phone_number is provided, we'll attempt to send an SMS
-        password_data = password_manager.auto_assign_next_password(vendor, phone_number)
+        password_data = password_manager.auto_assign_next_password(vendor, phone_number, user_id=user_id, match=match)
         
         if password_data:
             # Log usage
-            logger.info(f"Password automatically assigned: Vendor={vendor}, User ID={user_id}, Phone={phone_number}")
+            logger.info("Password automatically assigned: Vendor=%s", vendor,
+                        extra={"event": "password.api_assigned", "user_id": user_id, "phone": phone_number})
             
             # Add SMS status to the response if a phone number was provided
             if phone_number:
@@ -133,6 +217,41 @@ def get_password():
         logger.error(f"Error in get_password: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/get-passwords', methods=['POST'])
+def get_passwords():
+    """API endpoint to assign passwords for several requests at once; SMS are sent concurrently."""
+    try:
+        data = request.json or {}
+        items = data.get('requests')
+        if not isinstance(items, list) or not items:
+            return jsonify({"error": "requests must be a non-empty list"}), 400
+        if any(not isinstance(item, dict) or not item.get('vendor') for item in items):
+            return jsonify({"error": "Every request needs a vendor"}), 400
+            
+        # Resolve cada fornecedor uma vez; ambíguos não entram no lote
+        matches = [password_manager.find_vendor(item['vendor']) for item in items]
+        assignable = [dict(item, match=match) for item, match in zip(items, matches) if match.status != AMBIGUOUS]
+        assigned = iter(password_manager.auto_assign_many(assignable))
+        
+        results = []
+        for item, match in zip(items, matches):
+            if match.status == AMBIGUOUS:
+                results.append({"vendor": item['vendor'], "error": f"Ambiguous vendor: {item['vendor']}",
+                                "candidates": match.candidates})
+                continue
+            password_data = next(assigned)
+            if not password_data:
+                results.append({"vendor": item['vendor'], "error": f"No available passwords for vendor: {item['vendor']}"})
+                continue
+            if item.get('phone_number'):
+                password_data['sms_status'] = "sent" if password_data.get('sms_sent') else "failed"
+            results.append(password_data)
+        return jsonify({"results": results})
+        
+    except Exception as e:
+        logger.error(f"Error in get_passwords: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/api/sync-typebot', methods=['POST'])
 def sync_typebot():
     """Webhook to sync with Typebot when a password is requested."""
@@ -179,14 +298,173 @@ def reset_password():
 
 @app.route('/api/refresh-sheet', methods=['POST'])
 def refresh_sheet():
-    """Force refresh the sheet data from Google Sheets."""
+    """Force refresh the sheet data from Google Sheets. Use ?mode=delta to fetch only what changed."""
     try:
-        password_manager.refresh_data()
+        delta = request.args.get('mode') == 'delta'
+        password_manager.refresh_data(delta=delta)
         return jsonify({"status": "success", "message": "Sheet data refreshed"})
     except Exception as e:
         logger.error(f"Error refreshing sheet: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/inventory/import', methods=['POST'])
+@require_admin
+def import_inventory():
+    """Stream a CSV or NDJSON inventory from the request body into the sheet."""
+    try:
+        fmt = _inventory_format()
+        if fmt not in FORMATS:
+            return jsonify({"error": f"Unsupported format: {fmt}"}), 400
+            
+        lines = io.TextIOWrapper(request.stream, encoding='utf-8')
+        summary = password_manager.import_records(parse_records(lines, fmt))
+        if "error" in summary:
+            # Importação parcial: as linhas já gravadas continuam contadas em "imported"
+            return jsonify(summary), 502
+        return jsonify(summary)
+    except Exception as e:
+        logger.error(f"Error importing inventory: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/inventory/export', methods=['GET'])
+@require_admin
+def export_inventory():
+    """Stream the password inventory as CSV or NDJSON."""
+    fmt = _inventory_format()
+    if fmt not in FORMATS:
+        return jsonify({"error": f"Unsupported format: {fmt}"}), 400
+        
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    body = export_records(password_manager.iter_inventory_rows(), fmt)
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename=inventory.{fmt}"}
+    )
+
+def _timestamp_arg(name: str):
+    """Parse a query arg given as Unix seconds or ISO 8601 (UTC unless an offset is given) into a timestamp."""
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        parsed = datetime.fromisoformat(value)
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return parsed.timestamp()
+
+@app.route('/api/history/users/<user_id>', methods=['GET'])
+@require_admin
+def user_history(user_id):
+    """List the passwords a user received (newest first)."""
+    try:
+        limit = max(1, min(int(request.args.get('limit', 100)), 1000))
+        records = assignment_history.for_user(user_id, limit=limit, since=_timestamp_arg('since'))
+        return jsonify({"user_id": user_id, "assignments": records})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route('/api/history/vendors/hourly', methods=['GET'])
+@require_admin
+def vendor_hourly_history():
+    """Count assignments per vendor per hour."""
+    try:
+        vendor = request.args.get('vendor')
+        if vendor:
+            match = password_manager.find_vendor(vendor)
+            vendor = match.key if match else vendor
+            
+        counts = assignment_history.per_vendor_per_hour(
+            vendor=vendor,
+            since=_timestamp_arg('since'),
+            until=_timestamp_arg('until')
+        )
+        return jsonify({"counts": counts})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+# Profiling sob demanda; nada é instrumentado enquanto não houver sessão ativa
+profiler = ProfilingController(app, targets=[
+    (password_manager, ['refresh_data', 'get_next_password', 'auto_assign_next_password',
+                        'reserve_password', 'confirm_reservation', 'flush_pending_writes',
+                        'send_password_by_sms'], 'password_manager'),
+    (sheets_service, ['fetch_sheet_data', 'fetch_columns', 'fetch_rows', 'update_cell',
+                      'batch_update_statuses', 'append_rows'], 'sheets'),
+    (password_manager.twilio_service, ['send_sms'], 'twilio'),
+])
+
+@app.route('/admin/profile', methods=['GET'])
+@require_admin
+def profile_status():
+    """Show the profiling state of this worker."""
+    return jsonify(profiler.status())
+
+@app.route('/admin/profile/start', methods=['POST'])
+@require_admin
+def profile_start():
+    """Start a time-boxed profiling session (mode: sample, cprofile or trace) on this worker."""
+    data = request.get_json(silent=True) or {}
+    try:
+        profiler.start(
+            data.get('mode', 'sample'),
+            duration=data.get('duration', 30),
+            interval=data.get('interval', 0.005)
+        )
+        return jsonify(profiler.status())
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except RuntimeError as e:
+        return jsonify({"error": str(e)}), 409
+
+@app.route('/admin/profile/stop', methods=['POST'])
+@require_admin
+def profile_stop():
+    """Stop the active profiling session early."""
+    profiler.stop()
+    return jsonify(profiler.status())
+
+@app.route('/admin/profile/result', methods=['GET'])
+@require_admin
+def profile_result():
+    """Download the last result: collapsed stacks, pstats dump (?format=text for a report) or traces."""
+    if profiler.mode is not None:
+        return jsonify({"error": "Profiling still active", **profiler.status()}), 409
+    if profiler.result is None:
+        return jsonify({"error": "No profiling result available"}), 404
+        
+    mode, data = profiler.result
+    pid = profiler.status()["pid"]
+    if mode == 'sample':
+        return Response(data, mimetype='text/plain',
+                        headers={"Content-Disposition": f"attachment; filename=profile-{pid}.collapsed"})
+    if mode == 'cprofile':
+        if request.args.get('format') == 'text':
+            return Response(ProfilingController.summarize_stats(data), mimetype='text/plain')
+        return Response(data, mimetype='application/octet-stream',
+                        headers={"Content-Disposition": f"attachment; filename=profile-{pid}.pstats"})
+    return jsonify({"pid": pid, "traces": list(profiler.tracer.traces)})
+
+@app.cli.command('import-inventory')
+@click.argument('source', type=click.File('r', encoding='utf-8'))
+@click.option('--format', 'fmt', type=click.Choice(FORMATS), default='csv', help='Input format')
+@click.option('--chunk-size', default=500, show_default=True, help='Rows per append call')
+def import_inventory_command(source, fmt, chunk_size):
+    """Import a CSV/NDJSON inventory file (use - for stdin)."""
+    summary = password_manager.import_records(parse_records(source, fmt), chunk_size=chunk_size)
+    click.echo(json.dumps(summary, ensure_ascii=False, indent=2))
+    if "error" in summary:
+        raise click.ClickException(f"Import stopped: {summary['error']}")
+
+@app.cli.command('export-inventory')
+@click.option('--format', 'fmt', type=click.Choice(FORMATS), default='csv', help='Output format')
+@click.option('--output', type=click.File('w', encoding='utf-8'), default='-', help='Output file (default stdout)')
+def export_inventory_command(fmt, output):
+    """Export the password inventory as CSV/NDJSON."""
+    for chunk in export_records(password_manager.iter_inventory_rows(), fmt):
+        output.write(chunk)
+
 @app.errorhandler(404)
 def page_not_found(e):
     return render_template('index.html', error="Page not found"), 404
@@ -0,0 +1,170 @@
+import time
+import sqlite3
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS assignments (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    vendor TEXT NOT NULL COLLATE NOCASE,
+    password_number INTEGER,
+    row_index INTEGER,
+    user_id TEXT,
+    phone TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_assignments_user_ts ON assignments (user_id, ts);
+CREATE INDEX IF NOT EXISTS idx_assignments_phone_ts ON assignments (phone, ts);
+CREATE INDEX IF NOT EXISTS idx_assignments_vendor_ts ON assignments (vendor, ts);
+CREATE INDEX IF NOT EXISTS idx_assignments_ts ON assignments (ts);
+
+-- Contagem por fornecedor/hora mantida a cada inserção
+CREATE TABLE IF NOT EXISTS assignments_hourly (
+    vendor TEXT NOT NULL COLLATE NOCASE,
+    hour INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (vendor, hour)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_assignments_hourly_hour ON assignments_hourly (hour);
+"""
+
+
+def _iso(ts: float) -> str:
+    return datetime.fromtimestamp(ts, tz=timezone.utc).isoformat()
+
+
+class AssignmentHistory:
+    """
+    Append-only log of password assignments in a local SQLite database.
+
+    Only the vendor and password slot (row and column number) are stored,
+    never the password itself. Per-user lookups use the (user_id, ts) index;
+    hourly per-vendor counts come from a rollup table updated on insert, so
+    neither query scans the full history.
+    """
+
+    def __init__(self, db_path: str = "assignment_history.db"):
+        """
+        Initialize the history store.
+
+        Args:
+            db_path: SQLite database file (":memory:" for a throwaway store)
+        """
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        if db_path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+
+    def record(self, vendor: str, password_number: Optional[int] = None, row_index: Optional[int] = None,
+               user_id: Optional[str] = None, phone: Optional[str] = None, ts: Optional[float] = None) -> bool:
+        """
+        Append an assignment to the history.
+
+        Args:
+            vendor: Vendor name of the assigned password
+            password_number: Password column (1-5) that was assigned
+            row_index: Sheet row (1-based) of the password
+            user_id: Optional ID of the user who received it
+            phone: Optional phone number the password was sent to
+            ts: Unix timestamp of the assignment (defaults to now)
+
+        Returns:
+            True if recorded, False otherwise
+        """
+        ts = time.time() if ts is None else ts
+        try:
+            with self._lock, self._conn:
+                self._conn.execute(
+                    "INSERT INTO assignments (ts, vendor, password_number, row_index, user_id, phone) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (ts, vendor, password_number, row_index, user_id, phone)
+                )
+                self._conn.execute(
+                    "INSERT INTO assignments_hourly (vendor, hour, count) VALUES (?, ?, 1) "
+                    "ON CONFLICT (vendor, hour) DO UPDATE SET count = count + 1",
+                    (vendor, int(ts // 3600))
+                )
+            return True
+        except sqlite3.Error as e:
+            logger.error(f"Error recording assignment history: {str(e)}")
+            return False
+
+    def for_user(self, user_id: str, limit: int = 100, since: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        List the assignments received by a user, newest first.
+
+        Args:
+            user_id: User ID to look up
+            limit: Maximum number of records
+            since: Optional Unix timestamp lower bound
+
+        Returns:
+            List of assignment dictionaries
+        """
+        return self._select("user_id", user_id, limit, since)
+
+    def for_phone(self, phone: str, limit: int = 100, since: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        List the assignments sent to a phone number, newest first.
+
+        Args:
+            phone: Phone number to look up
+            limit: Maximum number of records
+            since: Optional Unix timestamp lower bound
+
+        Returns:
+            List of assignment dictionaries
+        """
+        return self._select("phone", phone, limit, since)
+
+    def _select(self, column: str, value: str, limit: int, since: Optional[float]) -> List[Dict[str, Any]]:
+        query = f"SELECT * FROM assignments WHERE {column} = ? AND ts >= ? ORDER BY ts DESC LIMIT ?"
+        with self._lock:
+            # LIMIT negativo no SQLite significa "sem limite"
+            rows = self._conn.execute(query, (value, since or 0, max(limit, 0))).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def per_vendor_per_hour(self, vendor: Optional[str] = None, since: Optional[float] = None,
+                            until: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Count assignments per vendor per hour.
+
+        Args:
+            vendor: Optional vendor name (case-insensitive) to restrict to
+            since: Optional Unix timestamp lower bound (inclusive hour)
+            until: Optional Unix timestamp upper bound (inclusive hour)
+
+        Returns:
+            List of {"vendor", "hour", "count"} dictionaries ordered by hour
+        """
+        conditions = ["hour >= ?", "hour <= ?"]
+        params = [int(since // 3600) if since else 0, int(until // 3600) if until else 2 ** 62]
+        if vendor:
+            conditions.append("vendor = ?")
+            params.append(vendor)
+
+        query = ("SELECT vendor, hour, count FROM assignments_hourly WHERE "
+                 + " AND ".join(conditions) + " ORDER BY hour, vendor")
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [{"vendor": row["vendor"], "hour": _iso(row["hour"] * 3600), "count": row["count"]} for row in rows]
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+        return {
+            "vendor": row["vendor"],
+            "password_number": row["password_number"],
+            "row_index": row["row_index"],
+            "user_id": row["user_id"],
+            "phone": row["phone"],
+            "timestamp": _iso(row["ts"]),
+        }
@@ -0,0 +1,103 @@
+"""
+Per-request logging overhead, before and after the queue-based pipeline.
+
+Simulates the log calls made while serving one /api/get-password request
+(assignment, auto-assignment, refresh, API log line, dashboard stats dump)
+and reports the time spent in the request thread. Each factor is measured
+separately at the same level: the log level, lazy %-style call sites, the
+queue handler and event sampling.
+
+    python benchmarks/bench_logging.py [requests]
+"""
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from logging_setup import configure_logging, shutdown_logging  # noqa: E402
+
+STATS = {
+    "total_passwords": 500,
+    "vendors": {f"Senhas : Vendedor {i}": {"total_passwords": 5, "available_passwords": 3, "used_passwords": 2}
+                for i in range(100)},
+}
+
+
+def request_before(logger):
+    vendor, password, phone = "Senhas : Supervisor", "1234-78956", "+5511999990000"
+    logger.info(f"Automatically sending password '{password}' for vendor '{vendor}'")
+    logger.info(f"Auto-assigned password: {password} for vendor: {vendor}")
+    logger.debug(f"Refreshed password data. Found {len(STATS['vendors'])} unique vendor entries.")
+    logger.info(f"Password automatically assigned: Vendor={vendor}, User ID=u1, Phone={phone}")
+    logger.debug(f"Stats returned: {STATS}")
+
+
+def request_after(logger):
+    vendor, phone = "Senhas : Supervisor", "+5511999990000"
+    logger.info("Password assigned for vendor '%s' (row %d, slot %d)", vendor, 2, 1,
+                extra={"event": "password.assigned"})
+    logger.info("Auto-assigned password for vendor: %s", vendor, extra={"event": "password.auto_assigned"})
+    logger.debug("Refreshed password data. Found %d unique vendor entries.", len(STATS['vendors']),
+                 extra={"event": "sheets.refreshed", "mode": "full"})
+    logger.info("Password automatically assigned: Vendor=%s", vendor,
+                extra={"event": "password.api_assigned", "user_id": "u1", "phone": phone})
+    logger.debug("Stats returned: %s", STATS)
+
+
+def run(label, request, logger, n):
+    start = time.perf_counter()
+    for _ in range(n):
+        request(logger)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<44} {elapsed / n * 1e6:8.1f} us/request")
+
+
+def run_sync(label, request, logger, n, level, stream):
+    """Run with a plain synchronous StreamHandler (the old basicConfig setup)."""
+    shutdown_logging()
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+    root.addHandler(handler)
+    root.setLevel(level)
+    run(label, request, logger, n)
+    root.removeHandler(handler)
+
+
+def run_queue(label, request, logger, n, level, stream, sample_rules=None):
+    """Run through the queue pipeline; sample_rules={} disables sampling."""
+    configure_logging(level=level, stream=stream, sample_rules=sample_rules)
+    run(label, request, logger, n)
+    shutdown_logging()
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    logger = logging.getLogger("bench")
+    devnull = open(os.devnull, "w")
+
+    # Cada linha muda um fator em relação à anterior
+    print("Level change (old call sites, synchronous handler)")
+    run_sync("  old calls, sync, DEBUG (original setup)", request_before, logger, n, "DEBUG", devnull)
+    run_sync("  old calls, sync, INFO", request_before, logger, n, "INFO", devnull)
+
+    print("Lazy formatting / new call sites (synchronous handler)")
+    run_sync("  new calls, sync, INFO", request_after, logger, n, "INFO", devnull)
+    run_sync("  new calls, sync, DEBUG", request_after, logger, n, "DEBUG", devnull)
+
+    print("Queue handler (new call sites, no sampling)")
+    run_queue("  new calls, queue, INFO", request_after, logger, n, "INFO", devnull, sample_rules={})
+    run_queue("  new calls, queue, DEBUG", request_after, logger, n, "DEBUG", devnull, sample_rules={})
+
+    print("Sampling (new call sites, queue)")
+    run_queue("  new calls, queue + sampling, INFO", request_after, logger, n, "INFO", devnull)
+    run_queue("  new calls, queue + sampling, DEBUG", request_after, logger, n, "DEBUG", devnull)
+    devnull.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+import csv
+import io
+import json
+import logging
+from typing import Any, Dict, Iterable, Iterator, List
+
+logger = logging.getLogger(__name__)
+
+# Mesma ordem das colunas A-G da planilha (GoogleSheetsService.column_mapping)
+FIELDS = ['vendor', 'senha1', 'senha2', 'senha3', 'senha4', 'senha5', 'usada']
+PASSWORD_FIELDS = FIELDS[1:6]
+USED_STATUS = "Usada"
+
+FORMATS = ('csv', 'ndjson')
+
+
+def parse_csv(lines: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    """
+    Parse a CSV inventory one row at a time.
+
+    The first line must be a header using the FIELDS names.
+
+    Args:
+        lines: Iterable of text lines (file object, request stream, ...)
+
+    Yields:
+        One dictionary per CSV row
+    """
+    for record in csv.DictReader(lines):
+        yield record
+
+
+def parse_ndjson(lines: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    """
+    Parse a newline-delimited JSON inventory one line at a time.
+
+    Args:
+        lines: Iterable of text lines
+
+    Yields:
+        One dictionary per non-empty line; invalid lines yield a dict with
+        an "_error" key so the caller can report them with a line number
+    """
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield {"_error": f"invalid JSON: {str(e)}"}
+            continue
+        if not isinstance(record, dict):
+            yield {"_error": "expected a JSON object"}
+            continue
+        yield record
+
+
+def parse_records(lines: Iterable[str], fmt: str) -> Iterator[Dict[str, Any]]:
+    """Parse an inventory stream in the given format ("csv" or "ndjson")."""
+    if fmt == 'csv':
+        return parse_csv(lines)
+    if fmt == 'ndjson':
+        return parse_ndjson(lines)
+    raise ValueError(f"Unsupported format: {fmt}")
+
+
+def record_to_row(record: Dict[str, Any]) -> List[str]:
+    """
+    Validate an inventory record and convert it to a sheet row.
+
+    Args:
+        record: Dictionary with the FIELDS keys
+
+    Returns:
+        Row with columns A-G
+
+    Raises:
+        ValueError: If the record is missing the vendor or has no passwords
+    """
+    if "_error" in record:
+        raise ValueError(record["_error"])
+
+    vendor = str(record.get('vendor') or '').strip()
+    if not vendor:
+        raise ValueError("vendor is required")
+
+    passwords = [str(record.get(field) or '').strip() for field in PASSWORD_FIELDS]
+    if not any(passwords):
+        raise ValueError("at least one password is required")
+
+    status = str(record.get('usada') or '').strip()
+    if status and status.lower() != USED_STATUS.lower():
+        raise ValueError(f"usada must be empty or '{USED_STATUS}'")
+
+    return [vendor] + passwords + [USED_STATUS if status else '']
+
+
+def row_to_record(row: List[Any]) -> Dict[str, str]:
+    """Convert a sheet row to an inventory record."""
+    return {field: (row[i] if len(row) > i else '') for i, field in enumerate(FIELDS)}
+
+
+def export_csv(rows: Iterable[List[Any]]) -> Iterator[str]:
+    """
+    Stream sheet rows as CSV text chunks, header first.
+
+    Args:
+        rows: Iterable of sheet rows (without the header row)
+
+    Yields:
+        One CSV line at a time
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    writer.writerow(FIELDS)
+    yield buffer.getvalue()
+
+    for row in rows:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerow([row[i] if len(row) > i else '' for i in range(len(FIELDS))])
+        yield buffer.getvalue()
+
+
+def export_ndjson(rows: Iterable[List[Any]]) -> Iterator[str]:
+    """
+    Stream sheet rows as newline-delimited JSON.
+
+    Args:
+        rows: Iterable of sheet rows (without the header row)
+
+    Yields:
+        One JSON line at a time
+    """
+    for row in rows:
+        yield json.dumps(row_to_record(row), ensure_ascii=False) + "\n"
+
+
+def export_records(rows: Iterable[List[Any]], fmt: str) -> Iterator[str]:
+    """Stream sheet rows in the given format ("csv" or "ndjson")."""
+    if fmt == 'csv':
+        return export_csv(rows)
+    if fmt == 'ndjson':
+        return export_ndjson(rows)
+    raise ValueError(f"Unsupported format: {fmt}")
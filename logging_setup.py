@@ -0,0 +1,205 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Campos de `extra` que nunca devem aparecer nos logs
+SECRET_FIELDS = {'password', 'senha', 'auth_token', 'token', 'credentials', 'secret'}
+# Campos com dados pessoais que são mascarados (mantém só o final)
+MASKED_FIELDS = {'phone', 'phone_number', 'to_phone'}
+
+REDACTED = "[REDACTED]"
+
+# Atributos padrão de LogRecord; o resto veio de `extra`
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'taskName'}
+
+# Eventos quentes: no máximo N registros por janela de segundos
+DEFAULT_SAMPLE_RULES = {
+    'password.assigned': (10, 1.0),
+    'password.auto_assigned': (10, 1.0),
+    'password.api_assigned': (10, 1.0),
+    'sheets.refreshed': (5, 1.0),
+    'sheets.cell_updated': (10, 1.0),
+    'sms.sent': (10, 1.0),
+}
+
+_listener = None
+
+
+def mask_value(value: object) -> str:
+    """Mask all but the last 4 characters of a value (e.g. a phone number)."""
+    text = str(value)
+    if len(text) <= 4:
+        return "***"
+    return "*" * (len(text) - 4) + text[-4:]
+
+
+def _record_extras(record: logging.LogRecord) -> Dict[str, object]:
+    return {k: v for k, v in vars(record).items() if k not in _RECORD_ATTRS}
+
+
+class RedactingFilter(logging.Filter):
+    """Redact secret fields and mask personal data passed through `extra`."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        for key in _record_extras(record):
+            lowered = key.lower()
+            if lowered in SECRET_FIELDS:
+                setattr(record, key, REDACTED)
+            elif lowered in MASKED_FIELDS and getattr(record, key):
+                setattr(record, key, mask_value(getattr(record, key)))
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Rate-limit hot events.
+
+    Records carrying an `event` extra listed in the rules are allowed at most
+    `limit` times per `window` seconds; the count of dropped records is
+    attached to the next emitted record as `sampled_out`. Warnings and errors
+    are never dropped.
+    """
+
+    def __init__(self, rules: Optional[Dict[str, Tuple[int, float]]] = None):
+        super().__init__()
+        self.rules = dict(DEFAULT_SAMPLE_RULES if rules is None else rules)
+        self._windows = {}  # event -> [window_start, count, dropped]
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        event = getattr(record, 'event', None)
+        rule = self.rules.get(event) if event else None
+        if rule is None or record.levelno >= logging.WARNING:
+            return True
+
+        limit, window = rule
+        now = time.monotonic()
+        with self._lock:
+            state = self._windows.get(event)
+            if state is None or now - state[0] >= window:
+                dropped = state[2] if state else 0
+                state = [now, 0, 0]
+                self._windows[event] = state
+            else:
+                dropped = 0
+
+            if state[1] >= limit:
+                state[2] += 1
+                return False
+
+            state[1] += 1
+            dropped += state[2]
+            state[2] = 0
+
+        if dropped:
+            record.sampled_out = dropped
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as one JSON object per line, including `extra` fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        payload.update(_record_extras(record))
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            payload["exc_info"] = record.exc_text
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Plain text formatter that appends `extra` fields as key=value pairs."""
+
+    def __init__(self):
+        super().__init__("%(levelname)s:%(name)s:%(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        text = super().format(record)
+        extras = _record_extras(record)
+        if extras:
+            text += " " + " ".join(f"{k}={v}" for k, v in extras.items())
+        return text
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that leaves message formatting to the listener thread.
+
+    The stock QueueHandler formats `msg % args` in the caller's thread before
+    enqueueing; here the record is enqueued as-is, so the request thread only
+    pays for creating the record. Arguments must not be mutated after the
+    logging call.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if record.exc_info and not record.exc_text:
+            # Tracebacks referenciam frames vivos; formata já
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def configure_logging(level: str = "INFO", json_output: bool = False,
+                      sample_rules: Optional[Dict[str, Tuple[int, float]]] = None,
+                      stream=None) -> logging.handlers.QueueListener:
+    """
+    Route all logging through a background queue listener.
+
+    Sampling and redaction run as filters on the queue handler so dropped
+    records are never enqueued; formatting and stream I/O happen on the
+    listener thread.
+
+    Args:
+        level: Root log level name
+        json_output: Emit JSON lines instead of plain text
+        sample_rules: Mapping of event -> (limit, window seconds); defaults to DEFAULT_SAMPLE_RULES
+        stream: Output stream for the listener (defaults to stderr)
+
+    Returns:
+        The started QueueListener
+    """
+    global _listener
+    shutdown_logging()
+
+    output = logging.StreamHandler(stream)
+    output.setFormatter(JsonFormatter() if json_output else TextFormatter())
+
+    log_queue = queue.SimpleQueue()
+    handler = DeferredQueueHandler(log_queue)
+    handler.addFilter(SamplingFilter(sample_rules))
+    handler.addFilter(RedactingFilter())
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level.upper())
+
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def shutdown_logging():
+    """Flush pending records and stop the background listener."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(shutdown_logging)
@@ -1,35 +1,104 @@
+import time
+import uuid
+import heapq
+import atexit
+import bisect
+import itertools
 import logging
-from typing import Dict, Any, List, Optional, Tuple
+import threading
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple
 from sheets_service import GoogleSheetsService
 from twilio_service import TwilioService
+from vendor_index import VendorIndex, VendorMatch, AMBIGUOUS
+from inventory_io import record_to_row
+from assignment_history import AssignmentHistory
 
 logger = logging.getLogger(__name__)
 
 class PasswordManager:
     """Manager for handling password operations."""
     
-    def __init__(self, sheets_service: GoogleSheetsService, twilio_service: Optional[TwilioService] = None):
+    def __init__(self, sheets_service: GoogleSheetsService, twilio_service: Optional[TwilioService] = None,
+                 vendor_aliases: Optional[Dict[str, str]] = None, full_refresh_every: int = 20,
+                 reservation_ttl: float = 300.0, write_batch_size: int = 20, write_flush_interval: float = 5.0,
+                 history: Optional[AssignmentHistory] = None):
         """
         Initialize the password manager.
         
         Args:
             sheets_service: Google Sheets service instance
             twilio_service: Optional Twilio service for sending SMS
+            vendor_aliases: Optional mapping of alias -> vendor name for lookups
+            full_refresh_every: Force a full refresh after this many delta refreshes
+            reservation_ttl: Seconds a reserved password is held before it is released
+            write_batch_size: Confirmed assignments buffered before a batch write to Sheets
+            write_flush_interval: Maximum seconds a confirmed assignment waits to be written
+            history: Optional store where every assignment is recorded
         """
         self.sheets_service = sheets_service
         self.twilio_service = twilio_service or TwilioService()
+        self.history = history
         self.password_data = []
         self.vendor_map = {}
+        self.password_index = {}
+        self.vendor_index = VendorIndex(aliases=vendor_aliases)
+        self.full_refresh_every = full_refresh_every
+        self._refreshes_since_full = 0
+        
+        # Estado para health checks: leitura O(1), sem acessar a planilha
+        self.loaded = False
+        self.last_refresh_at = None
+        
+        # Reservas em memória (reserve -> confirm/release) e escritas pendentes
+        self.reservation_ttl = reservation_ttl
+        self.write_batch_size = write_batch_size
+        self.write_flush_interval = write_flush_interval
+        self._lock = threading.RLock()
+        self._reservations = {}     # reservation_id -> reservation dict
+        self._reserved_passwords = {}  # password -> reservation_id (sobrevive a linhas deslocadas)
+        self._expiry_heap = []      # (expires_at, reservation_id)
+        self._pending_writes = {}   # password -> status (linha resolvida via password_index no flush)
+        self._flush_timer = None
+        atexit.register(self.flush_pending_writes)
+        
         self.refresh_data()
     
-    def refresh_data(self):
-        """Refresh password data from Google Sheets."""
+    def refresh_data(self, delta: bool = False):
+        """
+        Refresh password data from Google Sheets.
+        
+        Holds the manager lock for the whole fetch -> rebuild -> re-apply ->
+        flush sequence: a reserve or confirm running in between would otherwise
+        see a row confirmed here but not yet written read back as free.
+        Pending writes are flushed after the fetch so their rows are looked up
+        in the fresh data, even if rows were inserted or deleted meanwhile.
+        
+        Args:
+            delta: If True, fetch only the vendor/status columns first and
+                re-fetch just the rows that changed (see _delta_refresh)
+        """
+        with self._lock:
+            self._refresh_data(delta)
+    
+    def _refresh_data(self, delta: bool = False):
+        if delta and self.password_data:
+            self._refreshes_since_full += 1
+            if self._refreshes_since_full < self.full_refresh_every:
+                try:
+                    self._delta_refresh()
+                    self.flush_pending_writes()
+                    return
+                except Exception as e:
+                    logger.warning(f"Delta refresh failed, falling back to full refresh: {str(e)}")
+        
         try:
             data = self.sheets_service.fetch_sheet_data()
             self.password_data = data
+            self._refreshes_since_full = 0
             
             # Build vendor map for faster lookups - agora armazenaremos uma lista de índices por vendor
             self.vendor_map = {}
+            self.password_index = {}
             for i, row in enumerate(data):
                 if i == 0:  # Skip header row
                     continue
@@ -43,56 +112,273 @@ class PasswordManager:
                         
                     # Adicionar o índice desta linha ao mapa do vendor
                     self.vendor_map[vendor_key].append(i)
+                    self._index_passwords(row, i)
+            
+            # Atualiza o índice normalizado apenas com os vendors que mudaram
+            self.vendor_index.update(self.vendor_map.keys())
+            self._apply_pending_writes()
+            self.flush_pending_writes()
+            self.loaded = True
+            self.last_refresh_at = time.time()
                     
-            logger.debug(f"Refreshed password data. Found {len(self.vendor_map)} unique vendor entries.")
+            logger.debug("Refreshed password data. Found %d unique vendor entries.", len(self.vendor_map),
+                         extra={"event": "sheets.refreshed", "mode": "full"})
             
         except Exception as e:
             logger.error(f"Error refreshing password data: {str(e)}")
             # Em vez de propagar a exceção, inicializa com dados vazios
             self.password_data = []
             self.vendor_map = {}
+            self.password_index = {}
+            self.vendor_index.update(())
             logger.warning("Inicializado com dados vazios devido a erro de credenciais ou acesso à planilha.")
     
-    def get_next_password(self, vendor: str) -> Optional[Dict[str, Any]]:
+    def _delta_refresh(self):
+        """
+        Refresh only what changed since the last fetch.
+        
+        Columns A (vendor) and G (status) are fetched as a fingerprint. A row
+        newly marked "Usada" is patched in place; rows whose vendor changed,
+        appeared or disappeared, or whose status changed any other way (e.g. an
+        admin refilled the passwords and cleared "Usada") are re-fetched in
+        contiguous windows and re-indexed. Edits to the password columns alone
+        are not visible in the fingerprint and are picked up by the periodic
+        full refresh (full_refresh_every).
+        """
+        fingerprint = self.sheets_service.fetch_columns(['A', 'G'])
+        vendors = fingerprint.get('A', [])
+        statuses = fingerprint.get('G', [])
+        
+        changed_rows = []
+        status_updates = 0
+        for i in range(max(len(vendors), len(self.password_data))):
+            new_vendor = vendors[i] if i < len(vendors) else ''
+            current = self.password_data[i] if i < len(self.password_data) else []
+            current_vendor = current[0] if len(current) > 0 else ''
+            
+            if i >= len(self.password_data) or new_vendor != current_vendor:
+                changed_rows.append(i)
+                continue
+            
+            new_status = statuses[i] if i < len(statuses) else ''
+            current_status = current[6] if len(current) > 6 else ''
+            if new_status != current_status:
+                # Só "'' -> Usada" é seguro sem reler as senhas da linha
+                if current_status or new_status != "Usada":
+                    changed_rows.append(i)
+                    continue
+                if len(current) <= 6:
+                    current.extend([''] * (7 - len(current)))
+                current[6] = new_status
+                status_updates += 1
+        
+        # Muitas linhas mudaram (ex: linha inserida no meio): mais barato refazer tudo
+        if len(changed_rows) > len(self.password_data) // 2:
+            logger.debug("Delta refresh: %d rows changed, doing full refresh", len(changed_rows))
+            self._refresh_data()
+            return
+        
+        for first, last in self._row_windows(changed_rows):
+            rows = self.sheets_service.fetch_rows(first + 1, last + 1)  # 1-based
+            for i in range(first, last + 1):
+                offset = i - first
+                new_row = rows[offset] if offset < len(rows) else []
+                self._replace_row(i, new_row)
+        
+        # Remove linhas vazias que sobraram no final após exclusões
+        while self.password_data and not self.password_data[-1]:
+            self.password_data.pop()
+        
+        self.vendor_index.update(self.vendor_map.keys())
+        self._apply_pending_writes()
+        self.last_refresh_at = time.time()
+        logger.debug("Delta refresh: %d status updates, %d rows re-fetched", status_updates, len(changed_rows),
+                     extra={"event": "sheets.refreshed", "mode": "delta"})
+    
+    @staticmethod
+    def _row_windows(rows: List[int]) -> List[Tuple[int, int]]:
+        """Group sorted row indices into contiguous (first, last) windows."""
+        windows = []
+        for i in rows:
+            if windows and windows[-1][1] == i - 1:
+                windows[-1] = (windows[-1][0], i)
+            else:
+                windows.append((i, i))
+        return windows
+    
+    def _replace_row(self, i: int, new_row: List[Any]):
+        """Replace row i in password_data and keep vendor_map in sync."""
+        if i < len(self.password_data):
+            old_row = self.password_data[i]
+            if i > 0 and len(old_row) > 0:
+                old_key = old_row[0].lower()
+                indices = self.vendor_map.get(old_key, [])
+                if i in indices:
+                    indices.remove(i)
+                if not indices:
+                    self.vendor_map.pop(old_key, None)
+                for password in self._row_passwords(old_row):
+                    if self.password_index.get(password) == i:
+                        del self.password_index[password]
+            self.password_data[i] = new_row
+        else:
+            while len(self.password_data) < i:
+                self.password_data.append([])
+            self.password_data.append(new_row)
+        
+        if i > 0 and len(new_row) > 0:
+            bisect.insort(self.vendor_map.setdefault(new_row[0].lower(), []), i)
+            self._index_passwords(new_row, i)
+    
+    @staticmethod
+    def _row_passwords(row: List[Any]) -> List[str]:
+        """Return the non-empty passwords in columns B through F of a row."""
+        return [row[i] for i in range(1, 6) if len(row) > i and row[i] and row[i].strip()]
+    
+    def _index_passwords(self, row: List[Any], i: int):
+        for password in self._row_passwords(row):
+            self.password_index[password] = i
+    
+    def import_records(self, records: Iterable[Dict[str, Any]], chunk_size: int = 500,
+                       max_errors: int = 100) -> Dict[str, Any]:
+        """
+        Validate, deduplicate and append inventory records to the sheet.
+        
+        Records are consumed lazily and written in chunks of chunk_size rows
+        with one append call each; appended rows are merged into the local
+        data and indexes without a refresh. A record is a duplicate if any of
+        its passwords already exists in the inventory or earlier in the import.
+        
+        Args:
+            records: Iterable of dictionaries with the inventory_io.FIELDS keys
+            chunk_size: Number of rows per append call
+            max_errors: Maximum number of error messages kept in the summary
+            
+        Returns:
+            Dictionary with imported/duplicates/invalid counts and errors; if
+            writing to the sheet fails the import stops and the summary also
+            carries the failure under "error" (chunks already written stay
+            imported and are counted)
+        """
+        summary = {"imported": 0, "duplicates": 0, "invalid": 0, "errors": []}
+        seen = set()
+        chunk = []
+        
+        for line_number, record in enumerate(records, start=1):
+            try:
+                row = record_to_row(record)
+            except ValueError as e:
+                summary["invalid"] += 1
+                if len(summary["errors"]) < max_errors:
+                    summary["errors"].append({"record": line_number, "error": str(e)})
+                continue
+            
+            passwords = self._row_passwords(row)
+            if any(p in self.password_index or p in seen for p in passwords):
+                summary["duplicates"] += 1
+                continue
+            
+            seen.update(passwords)
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                if not self._import_chunk(chunk, summary):
+                    break
+                chunk = []
+        else:
+            if chunk:
+                self._import_chunk(chunk, summary)
+        
+        self.vendor_index.update(self.vendor_map.keys())
+        logger.info(f"Inventory import: {summary['imported']} imported, {summary['duplicates']} duplicates, "
+                    f"{summary['invalid']} invalid")
+        return summary
+    
+    def _import_chunk(self, rows: List[List[Any]], summary: Dict[str, Any]) -> bool:
+        """Append a chunk during an import, recording a write failure in the summary."""
+        try:
+            summary["imported"] += self._append_chunk(rows)
+            return True
+        except Exception as e:
+            logger.error(f"Inventory import stopped after {summary['imported']} rows: {str(e)}")
+            summary["error"] = str(e)
+            return False
+    
+    def _append_chunk(self, rows: List[List[Any]]) -> int:
+        """Append a chunk of rows to the sheet and merge it into the local data."""
+        first_row = self.sheets_service.append_rows(rows)
+        # Em modo demo não há resposta da API; usa a próxima linha local
+        start = (first_row - 1) if first_row else max(len(self.password_data), 1)
+        for offset, row in enumerate(rows):
+            self._replace_row(start + offset, row)
+        return len(rows)
+    
+    def iter_inventory_rows(self) -> Iterator[List[Any]]:
+        """
+        Iterate over the inventory rows (without the header) for export.
+        
+        Yields:
+            Sheet rows with columns A-G
+        """
+        for row in itertools.islice(self.password_data, 1, None):
+            if row:
+                yield row
+    
+    def find_vendor(self, vendor: str) -> VendorMatch:
+        """
+        Resolve a vendor name using the normalized lookup index.
+        
+        Args:
+            vendor: Vendor name as sent by the client (e.g. "Supervisor")
+            
+        Returns:
+            VendorMatch describing the resolved key or the ambiguous candidates
+        """
+        return self.vendor_index.lookup(vendor)
+    
+    def _vendor_rows(self, vendor: str, match: Optional[VendorMatch] = None) -> Optional[List[int]]:
+        """
+        Return the row indices for a vendor name, or None if it doesn't resolve
+        to exactly one vendor. A match already returned by find_vendor is
+        reused instead of resolving the name again.
+        """
+        match = match if match is not None else self.find_vendor(vendor)
+        if match.status == AMBIGUOUS:
+            logger.warning(f"Ambiguous vendor '{vendor}': matches {match.candidates}")
+            return None
+        if not match:
+            logger.warning(f"Vendor not found: {vendor}")
+            return None
+        return self.vendor_map.get(match.key)
+    
+    def get_next_password(self, vendor: str, match: Optional[VendorMatch] = None) -> Optional[Dict[str, Any]]:
         """
         Get the next available password for a vendor and mark it as used.
         
         Args:
             vendor: The vendor name to get a password for
+            match: Optional result of find_vendor(vendor), to avoid resolving the name twice
             
         Returns:
             Dictionary with password info or None if no passwords available
         """
-        vendor = vendor.lower()
-        
         try:
-            # Find vendor rows
-            row_indices = self.vendor_map.get(vendor)
-            if not row_indices:
-                logger.warning(f"Vendor not found: {vendor}")
-                return None
-            
-            # Procurar a primeira senha não usada deste vendor
-            for row_index in row_indices:
-                # Get the row data
-                row = self.password_data[row_index]
+            with self._lock:
+                # Reservas vencidas não podem bloquear a atribuição imediata
+                self._expire_reservations()
                 
-                # Find the first unused password in any of the 5 password columns
-                password_index = None
-                password_value = None
+                # Find vendor rows
+                row_indices = self._vendor_rows(vendor, match)
+                if not row_indices:
+                    return None
                 
-                # Check if the row has the "Usada" column (Column G) and if it's already marked as used
-                is_used = len(row) > 6 and row[6] == "Usada"
-                
-                if not is_used:
-                    # Check each password column (B through F) for an available password
-                    for i in range(1, 6):  # Columns B through F (indices 1-5)
-                        if len(row) > i and row[i] and row[i].strip():
-                            password_index = i
-                            password_value = row[i]
-                            break
-                            
-                if password_index is not None:
+                # Procurar a primeira senha não usada (nem reservada) deste vendor
+                for row_index in row_indices:
+                    row = self.password_data[row_index]
+                    available = self._available_password(row)
+                    if available is None:
+                        continue
+                    password_index, password_value = available
+                    
                     # Mark as used
                     self.sheets_service.mark_password_as_used(row_index + 1)  # +1 for 1-based row index
                     
@@ -103,7 +389,8 @@ class PasswordManager:
                     row[6] = "Usada"
                     
                     # Log that we're automatically sending this password
-                    logger.info(f"Automatically sending password '{password_value}' for vendor '{row[0]}'")
+                    logger.info("Password assigned for vendor '%s' (row %d, slot %d)", row[0], row_index + 1, password_index,
+                                extra={"event": "password.assigned"})
                     
                     return {
                         "vendor": row[0],
@@ -119,7 +406,249 @@ class PasswordManager:
         except Exception as e:
             logger.error(f"Error getting next password for {vendor}: {str(e)}")
             return None
+    
+    def _available_password(self, row: List[Any]) -> Optional[Tuple[int, str]]:
+        """
+        Return (column, password) of the row's next password, or None if the
+        row is marked "Usada", has no password or its password is reserved.
+        """
+        # Check if the row has the "Usada" column (Column G) and if it's already marked as used
+        if len(row) > 6 and row[6] == "Usada":
+            return None
+            
+        # Check each password column (B through F) for an available password
+        for i in range(1, 6):  # Columns B through F (indices 1-5)
+            if len(row) > i and row[i] and row[i].strip():
+                if row[i] in self._reserved_passwords:
+                    return None
+                return i, row[i]
+        return None
+            
+    def reserve_password(self, vendor: str, holder: Optional[str] = None, ttl: Optional[float] = None,
+                         match: Optional[VendorMatch] = None) -> Optional[Dict[str, Any]]:
+        """
+        Hold the next available password for a vendor without marking it as used.
+        
+        The reservation lives only in memory and expires after ttl seconds
+        unless it is confirmed or released first. Nothing is written to Sheets.
+        
+        Args:
+            vendor: The vendor name to reserve a password for
+            holder: Optional identifier of who holds the reservation (e.g. Typebot user ID)
+            ttl: Seconds before the reservation expires (defaults to reservation_ttl)
+            match: Optional result of find_vendor(vendor), to avoid resolving the name twice
+            
+        Returns:
+            Dictionary with reservation_id, vendor and expires_in, or None if no passwords available
+        """
+        ttl = ttl if ttl is not None else self.reservation_ttl
+        
+        with self._lock:
+            self._expire_reservations()
+            
+            row_indices = self._vendor_rows(vendor, match)
+            if not row_indices:
+                return None
+                
+            for row_index in row_indices:
+                row = self.password_data[row_index]
+                available = self._available_password(row)
+                if available is None:
+                    continue
+                password_number, password = available
+                
+                reservation_id = uuid.uuid4().hex
+                expires_at = time.monotonic() + ttl
+                self._reservations[reservation_id] = {
+                    "vendor": row[0],
+                    "password": password,
+                    "password_number": password_number,
+                    "holder": holder,
+                    "expires_at": expires_at
+                }
+                self._reserved_passwords[password] = reservation_id
+                heapq.heappush(self._expiry_heap, (expires_at, reservation_id))
+                
+                logger.info("Password reserved for vendor '%s' (row %d)", row[0], row_index + 1,
+                            extra={"event": "password.reserved", "holder": holder})
+                return {
+                    "reservation_id": reservation_id,
+                    "vendor": row[0],
+                    "expires_in": ttl
+                }
+                
+
+            logger.warning(f"No available passwords to reserve for vendor: {vendor}")
+            return None
+    
+    def confirm_reservation(self, reservation_id: str, phone_number: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Confirm a reservation: mark its password as used and queue the Sheets write.
+        
+        Args:
+            reservation_id: ID returned by reserve_password
+            phone_number: Optional phone number to send the password via SMS
+            
+        Returns:
+            Dictionary with password info, or None if the reservation is unknown or expired
+        """
+        with self._lock:
+            self._expire_reservations()
+            
+            reservation = self._reservations.pop(reservation_id, None)
+            if reservation is None:
+                logger.warning("Reservation not found or expired", extra={"reservation_id": reservation_id})
+                return None
+                
+            self._reserved_passwords.pop(reservation["password"], None)
+            
+            # A planilha pode ter mudado desde a reserva (refresh): localiza a linha pela senha
+            row_index = self.password_index.get(reservation["password"])
+            row = self.password_data[row_index] if row_index is not None and row_index < len(self.password_data) else []
+            password_number = reservation["password_number"]
+            if len(row) <= password_number or row[password_number] != reservation["password"] \
+                    or (len(row) > 6 and row[6] == "Usada"):
+                logger.warning("Reserved password is no longer available for vendor '%s'", reservation["vendor"])
+                return None
+                
+            if len(row) <= 6:
+                row.extend([''] * (7 - len(row)))
+            row[6] = "Usada"
+            self._queue_write(reservation["password"], "Usada")
+            
+        password_data = {
+            "vendor": reservation["vendor"],
+            "password": reservation["password"],
+            "password_number": password_number,
+            "row_index": row_index + 1
+        }
+        logger.info("Reservation confirmed for vendor '%s'", reservation["vendor"],
+                    extra={"event": "password.assigned"})
+        self._record_assignment(password_data, reservation["holder"], phone_number)
+        
+        if phone_number and self.twilio_service.is_configured():
+            password_data['sms_sent'] = self.send_password_by_sms(
+                phone_number,
+                password_data['vendor'],
+                password_data['password']
+            )
+            
+        return password_data
+    
+    def release_reservation(self, reservation_id: str) -> bool:
+        """
+        Release a reservation so its password becomes available again.
+        
+        Args:
+            reservation_id: ID returned by reserve_password
             
+        Returns:
+            True if the reservation existed, False otherwise
+        """
+        with self._lock:
+            reservation = self._reservations.pop(reservation_id, None)
+            if reservation is None:
+                return False
+            self._reserved_passwords.pop(reservation["password"], None)
+            logger.info("Reservation released for vendor '%s'", reservation["vendor"])
+            return True
+    
+    def _record_assignment(self, password_data: Dict[str, Any], user_id: Optional[str], phone_number: Optional[str]):
+        """Append an assignment to the history store, if one is configured."""
+        if self.history is None:
+            return
+        self.history.record(
+            password_data["vendor"],
+            password_number=password_data["password_number"],
+            row_index=password_data["row_index"],
+            user_id=user_id,
+            phone=phone_number
+        )
+    
+    def _expire_reservations(self):
+        """Drop reservations whose TTL has passed (heap ordered by expiry)."""
+        now = time.monotonic()
+        while self._expiry_heap and self._expiry_heap[0][0] <= now:
+            _, reservation_id = heapq.heappop(self._expiry_heap)
+            # Reservas já confirmadas/liberadas ficam no heap e são ignoradas aqui
+            reservation = self._reservations.pop(reservation_id, None)
+            if reservation is not None:
+                self._reserved_passwords.pop(reservation["password"], None)
+                logger.info("Reservation expired for vendor '%s'", reservation["vendor"],
+                            extra={"event": "password.reservation_expired"})
+    
+    def _queue_write(self, password: str, status: str):
+        """Buffer a status write; flush when the batch is full or after write_flush_interval."""
+        self._pending_writes[password] = status
+        if len(self._pending_writes) >= self.write_batch_size:
+            self.flush_pending_writes()
+        elif self._flush_timer is None:
+            self._flush_timer = threading.Timer(self.write_flush_interval, self.flush_pending_writes)
+            self._flush_timer.daemon = True
+            self._flush_timer.start()
+    
+    def flush_pending_writes(self) -> bool:
+        """
+        Write all buffered confirmations to Sheets in one batch.
+        
+        Rows are looked up through password_index at flush time. A password
+        no longer in the loaded data (row deleted) is dropped; while no data is
+        loaded the writes stay buffered.
+        
+        Returns:
+            True if there was nothing to write or the write succeeded
+        """
+        with self._lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+                
+            if not self._pending_writes:
+                return True
+                
+            if not self.password_index:
+                logger.warning(f"No sheet data loaded; keeping {len(self._pending_writes)} pending status writes")
+                return False
+                
+            pending = dict(self._pending_writes)
+            statuses = {}
+            for password, status in pending.items():
+                row_index = self.password_index.get(password)
+                if row_index is None:
+                    logger.warning("Pending status write dropped: password no longer in the sheet")
+                    del self._pending_writes[password]
+                    continue
+                statuses[row_index + 1] = status
+                
+            if self.sheets_service.batch_update_statuses(statuses):
+                for password, status in pending.items():
+                    if self._pending_writes.get(password) == status:
+                        del self._pending_writes[password]
+                logger.debug("Flushed %d pending status writes", len(statuses))
+                return True
+                
+            logger.error(f"Failed to flush {len(pending)} pending status writes; will retry")
+            self._flush_timer = threading.Timer(self.write_flush_interval, self.flush_pending_writes)
+            self._flush_timer.daemon = True
+            self._flush_timer.start()
+            return False
+    
+    @property
+    def pending_write_count(self) -> int:
+        """Number of confirmed assignments not yet written to Sheets."""
+        return len(self._pending_writes)
+    
+    def _apply_pending_writes(self):
+        """Re-apply buffered statuses on top of freshly fetched data."""
+        with self._lock:
+            for password, status in self._pending_writes.items():
+                i = self.password_index.get(password)
+                if i is not None and i < len(self.password_data):
+                    row = self.password_data[i]
+                    if len(row) <= 6:
+                        row.extend([''] * (7 - len(row)))
+                    row[6] = status
+    
     def send_password_by_sms(self, phone_number: str, vendor: str, password: str) -> bool:
         """
         Send a password via SMS using Twilio.
@@ -137,21 +666,71 @@ class PasswordManager:
             return False
             
         try:
-            message = f"Olá! Sua senha para {vendor} é: {password}"
+            message = self._sms_message(vendor, password)
             sid = self.twilio_service.send_sms(phone_number, message)
             
             if sid:
-                logger.info(f"SMS sent successfully to {phone_number} for {vendor}")
+                logger.info("SMS sent for vendor '%s'", vendor, extra={"event": "sms.sent", "phone": phone_number})
                 return True
             else:
-                logger.error(f"Failed to send SMS to {phone_number}")
+                logger.error("Failed to send SMS for vendor '%s'", vendor, extra={"phone": phone_number})
                 return False
                 
         except Exception as e:
             logger.error(f"Error sending SMS: {str(e)}")
             return False
             
-    def auto_assign_next_password(self, vendor: str, phone_number: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    @staticmethod
+    def _sms_message(vendor: str, password: str) -> str:
+        return f"Olá! Sua senha para {vendor} é: {password}"
+    
+    def auto_assign_many(self, assignments: List[Dict[str, Any]]) -> List[Optional[Dict[str, Any]]]:
+        """
+        Assign passwords for several requests and send their SMS concurrently.
+        
+        Passwords are assigned one after another, then all SMS go out through
+        TwilioService.send_many (bounded concurrency), followed by a single
+        delta refresh instead of one per assignment.
+        
+        Args:
+            assignments: List of dictionaries with "vendor" and optional
+                "phone_number", "user_id" and "match" (the find_vendor result)
+            
+        Returns:
+            Password info (with "sms_sent" when a phone number was given) or
+            None for each request, in input order
+        """
+        results = []
+        sms_batch = []  # (índice do resultado, telefone, mensagem)
+        
+        for item in assignments:
+            vendor = item.get('vendor')
+            phone_number = item.get('phone_number')
+            password_data = self.get_next_password(vendor, item.get('match')) if vendor else None
+            results.append(password_data)
+            if not password_data:
+                continue
+                
+            self._record_assignment(password_data, item.get('user_id'), phone_number)
+            if phone_number:
+                password_data['sms_sent'] = False
+                sms_batch.append((len(results) - 1, phone_number,
+                                  self._sms_message(password_data['vendor'], password_data['password'])))
+        
+        if sms_batch and self.twilio_service.is_configured():
+            sids = self.twilio_service.send_many((phone, message) for _, phone, message in sms_batch)
+            for (index, _, _), sid in zip(sms_batch, sids):
+                results[index]['sms_sent'] = bool(sid)
+        
+        if any(results):
+            logger.info("Auto-assigned %d passwords in batch", sum(1 for r in results if r),
+                        extra={"event": "password.auto_assigned"})
+            self.refresh_data(delta=True)
+        return results
+    
+    def auto_assign_next_password(self, vendor: str, phone_number: Optional[str] = None,
+                                  user_id: Optional[str] = None,
+                                  match: Optional[VendorMatch] = None) -> Optional[Dict[str, Any]]:
         """
         Automatically assign and send the next available password for a vendor.
         This method gets the next password and marks the current one as used.
@@ -159,15 +738,18 @@ class PasswordManager:
         Args:
             vendor: The vendor name to get a password for
             phone_number: Optional phone number to send the password via SMS
+            user_id: Optional ID of the user receiving the password (for the history)
+            match: Optional result of find_vendor(vendor), to avoid resolving the name twice
             
         Returns:
             Dictionary with password info or None if no passwords available
         """
         # Get the next password
-        password_data = self.get_next_password(vendor)
+        password_data = self.get_next_password(vendor, match)
         
         if password_data:
             # We've successfully assigned a password
+            self._record_assignment(password_data, user_id, phone_number)
             
             # If phone number is provided and Twilio is configured, send SMS
             if phone_number and self.twilio_service.is_configured():
@@ -178,10 +760,10 @@ class PasswordManager:
                 )
                 password_data['sms_sent'] = sms_sent
             
-            logger.info(f"Auto-assigned password: {password_data['password']} for vendor: {vendor}")
+            logger.info("Auto-assigned password for vendor: %s", vendor, extra={"event": "password.auto_assigned"})
             
-            # Refresh data to ensure we have the latest state
-            self.refresh_data()
+            # Refresh data to ensure we have the latest state (só o que mudou)
+            self.refresh_data(delta=True)
             
             return password_data
         else:
@@ -199,13 +781,10 @@ class PasswordManager:
         Returns:
             True if successful, False otherwise
         """
-        vendor = vendor.lower()
-        
         try:
             # Find vendor rows
-            row_indices = self.vendor_map.get(vendor)
+            row_indices = self._vendor_rows(vendor)
             if not row_indices:
-                logger.warning(f"Vendor not found: {vendor}")
                 return False
             
             # Procurar a senha específica nas linhas deste vendor
@@ -221,18 +800,24 @@ class PasswordManager:
                         break
                 
                 if password_exists:
-                    # Mark as unused
-                    result = self.sheets_service.mark_password_as_unused(row_index + 1)
+                    with self._lock:
+                        # Descarta uma confirmação ainda não gravada, senão o flush
+                        # escreveria "Usada" por cima deste reset
+                        for row_password in self._row_passwords(row):
+                            self._pending_writes.pop(row_password, None)
+                        
+                        # Mark as unused
+                        result = self.sheets_service.mark_password_as_unused(row_index + 1)
                     
                     # Update our local data
                     if result and len(row) > 6:
                         row[6] = ""
                         
-                    logger.info(f"Reset password '{password}' for vendor '{row[0]}'")
+                    logger.info("Reset password at row %d for vendor '%s'", row_index + 1, row[0])
                     return result
             
             # Se chegou aqui, não encontrou a senha
-            logger.warning(f"Password {password} not found for vendor {vendor}")
+            logger.warning("Password to reset not found for vendor %s", vendor)
             return False
             
         except Exception as e:
@@ -300,7 +885,7 @@ class PasswordManager:
             }
             
             # Log das estatísticas para depuração
-            logger.debug(f"Calculated statistics: {stats}")
+            logger.debug("Calculated statistics: %s", stats)
             
             return stats
             
@@ -0,0 +1,320 @@
+import io
+import os
+import sys
+import time
+import marshal
+import pstats
+import cProfile
+import logging
+import threading
+from collections import Counter, deque
+from functools import wraps
+from typing import Any, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+MAX_DURATION = 300.0
+
+
+class StackSampler:
+    """
+    Sample the stacks of all threads at a fixed interval.
+
+    Produces the "collapsed stack" format (`frame;frame;frame count`) read by
+    flamegraph.pl and speedscope.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.counts = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                self.counts[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.counts.most_common())
+
+
+class Tracer:
+    """
+    Record per-request spans for selected methods.
+
+    Methods are wrapped on the instances only while tracing is active and
+    restored afterwards, so inactive tracing adds no calls at all.
+    """
+
+    def __init__(self, max_traces: int = 200):
+        self.traces = deque(maxlen=max_traces)
+        self._local = threading.local()
+        self._patched = []  # (obj, method name)
+
+    def instrument(self, obj: Any, methods: List[str], prefix: str):
+        for name in methods:
+            original = getattr(obj, name, None)
+            if original is None or name in vars(obj):
+                continue
+            setattr(obj, name, self._wrap(original, f"{prefix}.{name}"))
+            self._patched.append((obj, name))
+
+    def uninstrument(self):
+        for obj, name in self._patched:
+            vars(obj).pop(name, None)
+        self._patched = []
+
+    def _wrap(self, func, span_name: str):
+        local = self._local
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            spans = getattr(local, 'spans', None)
+            if spans is None:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                spans.append((span_name, start, time.perf_counter()))
+        return wrapper
+
+    def begin(self):
+        self._local.spans = []
+        self._local.start = time.perf_counter()
+
+    def end(self, method: str, path: str, status: str):
+        spans = getattr(self._local, 'spans', None)
+        if spans is None:
+            return
+        start = self._local.start
+        self._local.spans = None
+        self.traces.append({
+            "method": method,
+            "path": path,
+            "status": status,
+            "duration_ms": round((time.perf_counter() - start) * 1000, 3),
+            "spans": [
+                {"name": name, "start_ms": round((s - start) * 1000, 3), "duration_ms": round((e - s) * 1000, 3)}
+                for name, s, e in spans
+            ],
+        })
+
+
+class ProfilingController:
+    """
+    Time-boxed profiling for a single worker process.
+
+    Modes:
+        sample: background stack sampler; result is a collapsed-stack file
+        cprofile: cProfile around one request at a time; result is a pstats dump
+        trace: per-request spans for the instrumented service methods
+
+    While nothing is active the WSGI app is the original one and no methods
+    are wrapped.
+    """
+
+    def __init__(self, app, targets: List[Tuple[Any, List[str], str]]):
+        """
+        Initialize the controller.
+
+        Args:
+            app: Flask app whose wsgi_app is wrapped while a session is active
+            targets: (object, method names, span prefix) tuples to trace
+        """
+        self.app = app
+        self.targets = targets
+        self.tracer = Tracer()
+        self.mode = None
+        self.started_at = None
+        self.ends_at = None
+        self.result = None  # (mode, bytes)
+        self._sampler = None
+        self._stats = None
+        self._stats_lock = threading.Lock()
+        # Python 3.12+ permite um só profiler ativo por processo
+        self._cprofile_lock = threading.Lock()
+        self.skipped_requests = 0
+        self._timer = None
+        self._original_wsgi_app = None
+        self._lock = threading.Lock()
+
+    def start(self, mode: str, duration: float, interval: float = 0.005):
+        """
+        Start a profiling session that stops by itself after duration seconds.
+
+        Raises:
+            ValueError: If the mode, duration or interval is invalid
+            RuntimeError: If a session is already running
+        """
+        if mode not in ('sample', 'cprofile', 'trace'):
+            raise ValueError(f"Unknown profiling mode: {mode}")
+        try:
+            duration = max(0.1, min(float(duration), MAX_DURATION))
+            interval = float(interval)
+        except (TypeError, ValueError):
+            raise ValueError("duration and interval must be numbers")
+        if interval <= 0:
+            raise ValueError("interval must be positive")
+
+        with self._lock:
+            if self.mode is not None:
+                raise RuntimeError(f"Profiling already active ({self.mode})")
+
+            self.mode = mode
+            self.result = None
+            self.started_at = time.time()
+            self.ends_at = self.started_at + duration
+
+            if mode == 'sample':
+                self._sampler = StackSampler(interval=interval)
+                self._sampler.start()
+            else:
+                if mode == 'cprofile':
+                    self._stats = None
+                    self.skipped_requests = 0
+                else:
+                    self.tracer.traces.clear()
+                    for obj, methods, prefix in self.targets:
+                        self.tracer.instrument(obj, methods, prefix)
+                self._original_wsgi_app = self.app.wsgi_app
+                self.app.wsgi_app = self._make_wsgi_wrapper(self._original_wsgi_app, mode)
+
+            self._timer = threading.Timer(duration, self.stop)
+            self._timer.daemon = True
+            self._timer.start()
+
+        logger.warning("Profiling started: mode=%s duration=%.1fs pid=%d", mode, duration, os.getpid())
+
+    def stop(self):
+        """Stop the active session and keep its result."""
+        with self._lock:
+            if self.mode is None:
+                return
+            mode = self.mode
+
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+            if mode == 'sample':
+                self._sampler.stop()
+                self.result = ('sample', self._sampler.collapsed().encode('utf-8'))
+                self._sampler = None
+            else:
+                self.app.wsgi_app = self._original_wsgi_app
+                self._original_wsgi_app = None
+                if mode == 'cprofile':
+                    self.result = ('cprofile', self._dump_stats())
+                else:
+                    self.tracer.uninstrument()
+                    self.result = ('trace', None)
+
+            self.mode = None
+
+        logger.warning("Profiling stopped: mode=%s pid=%d", mode, os.getpid())
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "pid": os.getpid(),
+            "active": self.mode,
+            "started_at": self.started_at,
+            "ends_at": self.ends_at,
+            "result_available": self.result[0] if self.result else None,
+            "skipped_requests": self.skipped_requests,
+        }
+
+    def _make_wsgi_wrapper(self, wsgi_app, mode: str):
+        controller = self
+
+        def profiled_wsgi_app(environ, start_response):
+            if mode == 'cprofile':
+                return controller._profile_request(wsgi_app, environ, start_response)
+
+            status = []
+
+            def capture_start_response(status_line, headers, exc_info=None):
+                status.append(status_line)
+                return start_response(status_line, headers, exc_info)
+
+            controller.tracer.begin()
+            try:
+                return wsgi_app(environ, capture_start_response)
+            finally:
+                controller.tracer.end(environ.get('REQUEST_METHOD', ''), environ.get('PATH_INFO', ''),
+                                      status[0] if status else '')
+
+        return profiled_wsgi_app
+
+    def _profile_request(self, wsgi_app, environ, start_response):
+        """
+        Run one request under cProfile.
+        
+        Only one request is profiled at a time; requests overlapping it (or
+        arriving while another profiler holds the process) run unprofiled
+        and are counted in skipped_requests instead of failing.
+        """
+        if not self._cprofile_lock.acquire(blocking=False):
+            self._count_skipped()
+            return wsgi_app(environ, start_response)
+        try:
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError:
+                self._count_skipped()
+                return wsgi_app(environ, start_response)
+            try:
+                return wsgi_app(environ, start_response)
+            finally:
+                profile.disable()
+                self._add_stats(profile)
+        finally:
+            self._cprofile_lock.release()
+    
+    def _count_skipped(self):
+        with self._stats_lock:
+            self.skipped_requests += 1
+    
+    def _add_stats(self, profile: cProfile.Profile):
+        with self._stats_lock:
+            if self._stats is None:
+                self._stats = pstats.Stats(profile)
+            else:
+                self._stats.add(profile)
+
+    def _dump_stats(self) -> bytes:
+        """Serialize the aggregated stats in the format written by pstats.dump_stats."""
+        with self._stats_lock:
+            if self._stats is None:
+                return marshal.dumps({})
+            return marshal.dumps(self._stats.stats)
+
+    @staticmethod
+    def summarize_stats(data: bytes, limit: int = 30) -> str:
+        """Render a pstats dump as the usual cumulative-time text report."""
+        stats = pstats.Stats(stream=io.StringIO())
+        stats.stats = marshal.loads(data)
+        stats.get_top_level_stats()
+        stats.sort_stats('cumulative').print_stats(limit)
+        return stats.stream.getvalue()
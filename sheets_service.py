@@ -1,11 +1,12 @@
 import os
+import re
 import json
+import time
 import logging
 from typing import List, Dict, Any, Optional
 import google.auth
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
 
 logger = logging.getLogger(__name__)
 
@@ -38,6 +39,9 @@ class GoogleSheetsService:
                 self.service = None
                 
         self.sheet_data = {}
+        # Último erro da API, exposto pelos health checks sem consultar a planilha
+        self.last_error = None
+        self.last_error_at = None
         # Map columns to match Google Sheets structure
         # The column_mapping is adjusted to match your spreadsheet:
         # Column A: Vendor name (Senhas : Supervisor, etc.)
@@ -53,6 +57,11 @@ class GoogleSheetsService:
             'usada': 6,   # Column G - Status (Usada column)
         }
         
+    def _record_error(self, error: Exception):
+        """Remember the last Sheets API error for health reporting."""
+        self.last_error = str(error)
+        self.last_error_at = time.time()
+    
     def _create_sheets_service(self, credentials_json: Optional[str]):
         """Create and return an authorized Sheets API service instance."""
         try:
@@ -80,26 +89,29 @@ class GoogleSheetsService:
             logger.error(f"Error creating Sheets service: {str(e)}")
             raise
     
-    def fetch_sheet_data(self, sheet_range: str = "A1:G100") -> List[List[Any]]:
+    def _demo_data(self) -> List[List[Any]]:
+        """Return sample data for demo purposes matching your spreadsheet format."""
+        return [
+            ['Vendedor', 'Senhas 1', 'Senhas 2', 'Senhas 3', 'Senhas 4', 'Senhas 5', 'Usada'],
+            ['Senhas : Supervisor', '1234-78956', '1234-4569', '1234-4570', '1234-4571', '1234-4572', ''],
+            ['Senhas : Vendedor da Equipe Especial', '1234-78957', '1234-78950', '1234-78951', '1234-78952', '1234-78953', ''],
+            ['Senhas : Gerente', '1234-78940', '1234-78941', '1234-78942', '1234-78943', '1234-78944', ''],
+            ['Senhas : Vendedor Medicamento', '1234-78980', '1234-78981', '1234-78982', '1234-78983', '1234-78984', 'Usada'],
+            ['Senhas : Vendedor Alimento', '1234-78990', '1234-78991', '1234-78992', '1234-78993', '1234-78994', '']
+        ]
+    
+    def fetch_sheet_data(self, sheet_range: str = "A1:G") -> List[List[Any]]:
         """
         Fetch data from the specified range in the Google Sheet.
         
         Args:
-            sheet_range: The range to fetch (e.g., "A1:G100")
+            sheet_range: The range to fetch (e.g., "A1:G100"); defaults to every row of columns A-G
             
         Returns:
             List of rows with values
         """
         if self.demo_mode:
-            # Return sample data for demo purposes matching your spreadsheet format
-            return [
-                ['Vendedor', 'Senhas 1', 'Senhas 2', 'Senhas 3', 'Senhas 4', 'Senhas 5', 'Usada'],
-                ['Senhas : Supervisor', '1234-78956', '1234-4569', '1234-4570', '1234-4571', '1234-4572', ''],
-                ['Senhas : Vendedor da Equipe Especial', '1234-78957', '1234-78950', '1234-78951', '1234-78952', '1234-78953', ''],
-                ['Senhas : Gerente', '1234-78940', '1234-78941', '1234-78942', '1234-78943', '1234-78944', ''],
-                ['Senhas : Vendedor Medicamento', '1234-78980', '1234-78981', '1234-78982', '1234-78983', '1234-78984', 'Usada'],
-                ['Senhas : Vendedor Alimento', '1234-78990', '1234-78991', '1234-78992', '1234-78993', '1234-78994', '']
-            ]
+            return self._demo_data()
         
         try:
             result = self.service.spreadsheets().values().get(
@@ -112,8 +124,98 @@ class GoogleSheetsService:
                 logger.warning("No data found in the specified sheet range")
             return values
             
-        except HttpError as e:
+        except Exception as e:
             logger.error(f"Error fetching Google Sheet data: {str(e)}")
+            self._record_error(e)
+            raise
+    
+    def fetch_rows(self, first_row: int, last_row: int) -> List[List[Any]]:
+        """
+        Fetch a window of full rows (columns A-G).
+        
+        Args:
+            first_row: First row number (1-based, inclusive)
+            last_row: Last row number (1-based, inclusive)
+            
+        Returns:
+            List of rows with values; trailing empty rows are omitted
+        """
+        if self.demo_mode:
+            return self._demo_data()[first_row - 1:last_row]
+        return self.fetch_sheet_data(f"A{first_row}:G{last_row}")
+    
+    def fetch_columns(self, columns: List[str], first_row: int = 1, last_row: Optional[int] = None) -> Dict[str, List[Any]]:
+        """
+        Fetch only the given columns in a single batchGet call.
+        
+        Used as a lightweight fingerprint of the sheet for delta refreshes.
+        
+        Args:
+            columns: Column letters to fetch (e.g. ['A', 'G'])
+            first_row: First row number (1-based, inclusive)
+            last_row: Last row number (1-based, inclusive); None reads to the end of the sheet
+            
+        Returns:
+            Dictionary mapping column letter to the list of its cell values
+        """
+        if self.demo_mode:
+            data = self._demo_data()[first_row - 1:last_row]
+            result = {}
+            for column in columns:
+                index = ord(column.upper()) - ord('A')
+                result[column] = [row[index] if len(row) > index else '' for row in data]
+            return result
+        
+        try:
+            result = self.service.spreadsheets().values().batchGet(
+                spreadsheetId=self.spreadsheet_id,
+                ranges=[f"{column}{first_row}:{column}{last_row or ''}" for column in columns],
+                majorDimension='COLUMNS'
+            ).execute()
+            
+            columns_data = {}
+            for column, value_range in zip(columns, result.get('valueRanges', [])):
+                values = value_range.get('values', [])
+                columns_data[column] = values[0] if values else []
+            return columns_data
+            
+        except Exception as e:
+            logger.error(f"Error fetching Google Sheet columns: {str(e)}")
+            self._record_error(e)
+            raise
+    
+    def append_rows(self, rows: List[List[Any]]) -> Optional[int]:
+        """
+        Append rows after the last row of the sheet in a single API call.
+        
+        Args:
+            rows: Rows to append (columns A-G)
+            
+        Returns:
+            Row number (1-based) where the first appended row was written,
+            or None in demo mode / if the API response has no range
+        """
+        if self.demo_mode:
+            logger.info(f"Demo mode: Would append {len(rows)} rows")
+            return None
+        
+        try:
+            result = self.service.spreadsheets().values().append(
+                spreadsheetId=self.spreadsheet_id,
+                range="A1:G1",
+                valueInputOption='RAW',
+                insertDataOption='INSERT_ROWS',
+                body={'values': rows}
+            ).execute()
+            
+            # updatedRange vem no formato "'Página1'!A7:G9"
+            updated_range = result.get('updates', {}).get('updatedRange', '')
+            match = re.search(r'![A-Z]+(\d+)', updated_range)
+            return int(match.group(1)) if match else None
+            
+        except Exception as e:
+            logger.error(f"Error appending rows to Google Sheet: {str(e)}")
+            self._record_error(e)
             raise
     
     def update_cell(self, row: int, column: str, value: str) -> bool:
@@ -130,7 +232,7 @@ class GoogleSheetsService:
         """
         if self.demo_mode:
             # In demo mode, we don't actually update the sheet, but return success
-            logger.info(f"Demo mode: Would update cell {column}{row} to value '{value}'")
+            logger.info("Demo mode: Would update cell %s%d", column, row, extra={"event": "sheets.cell_updated"})
             return True
             
         try:
@@ -150,6 +252,43 @@ class GoogleSheetsService:
             
         except Exception as e:
             logger.error(f"Error updating Google Sheet cell: {str(e)}")
+            self._record_error(e)
+            return False
+    
+    def batch_update_statuses(self, statuses: Dict[int, str]) -> bool:
+        """
+        Update the 'Usada' column of several rows in a single batchUpdate call.
+        
+        Args:
+            statuses: Mapping of row index (1-based) -> status value
+            
+        Returns:
+            True if successful, False otherwise
+        """
+        if not statuses:
+            return True
+            
+        if self.demo_mode:
+            logger.info("Demo mode: Would update status of %d rows", len(statuses),
+                        extra={"event": "sheets.cell_updated"})
+            return True
+            
+        try:
+            body = {
+                'valueInputOption': 'USER_ENTERED',
+                'data': [{'range': f"G{row}", 'values': [[value]]} for row, value in sorted(statuses.items())]
+            }
+            
+            self.service.spreadsheets().values().batchUpdate(
+                spreadsheetId=self.spreadsheet_id,
+                body=body
+            ).execute()
+            
+            return True
+            
+        except Exception as e:
+            logger.error(f"Error batch updating Google Sheet statuses: {str(e)}")
+            self._record_error(e)
             return False
     
     def mark_password_as_used(self, row_index: int) -> bool:
@@ -164,7 +303,7 @@ class GoogleSheetsService:
         """
         try:
             if self.demo_mode:
-                logger.info(f"Demo mode: Marking password at row {row_index} as used")
+                logger.info("Demo mode: Marking password at row %d as used", row_index, extra={"event": "sheets.cell_updated"})
                 return True
             return self.update_cell(row_index, 'G', 'Usada')
         except Exception as e:
@@ -0,0 +1,74 @@
+import threading
+import time
+
+from password_manager import PasswordManager
+
+
+class FakeTwilio:
+    def is_configured(self):
+        return False
+
+
+class FakeSheets:
+    """In-memory stand-in for GoogleSheetsService with a small network delay."""
+
+    def __init__(self, rows, delay=0.001):
+        self.rows = [list(row) for row in rows]
+        self.delay = delay
+        self.fail_writes = False
+        self._lock = threading.Lock()
+
+    def _snapshot(self, first=0, last=None):
+        time.sleep(self.delay)
+        with self._lock:
+            return [list(row) for row in self.rows[first:last]]
+
+    def _set_status(self, row_number, status):
+        row = self.rows[row_number - 1]
+        row.extend([''] * (7 - len(row)))
+        row[6] = status
+
+    def fetch_sheet_data(self):
+        return self._snapshot()
+
+    def fetch_rows(self, first_row, last_row):
+        return self._snapshot(first_row - 1, last_row)
+
+    def fetch_columns(self, columns, first_row=1, last_row=None):
+        rows = self._snapshot(first_row - 1, last_row)
+        result = {}
+        for column in columns:
+            index = ord(column) - ord('A')
+            result[column] = [row[index] if len(row) > index else '' for row in rows]
+        return result
+
+    def batch_update_statuses(self, statuses):
+        time.sleep(self.delay)
+        if self.fail_writes:
+            return False
+        with self._lock:
+            for row_number, status in statuses.items():
+                self._set_status(row_number, status)
+        return True
+
+    def mark_password_as_used(self, row_index):
+        return self.batch_update_statuses({row_index: "Usada"})
+
+    def mark_password_as_unused(self, row_index):
+        return self.batch_update_statuses({row_index: ""})
+
+    def insert_row(self, index, row):
+        with self._lock:
+            self.rows.insert(index, list(row))
+
+
+def make_rows(vendors, per_vendor):
+    rows = [["Fornecedor", "Senha 1", "Senha 2", "Senha 3", "Senha 4", "Senha 5", "Usada"]]
+    for vendor in vendors:
+        for n in range(per_vendor):
+            rows.append([f"Senhas : {vendor}", f"{vendor}-{n}", "", "", "", "", ""])
+    return rows
+
+
+def make_manager(sheets, **kwargs):
+    return PasswordManager(sheets, twilio_service=FakeTwilio(), **kwargs)
@@ -0,0 +1,24 @@
+from assignment_history import AssignmentHistory
+
+
+def make_history(count):
+    history = AssignmentHistory(":memory:")
+    for n in range(count):
+        history.record("Senhas : Gerente", password_number=1, row_index=n + 2, user_id="u1", ts=1_700_000_000 + n)
+    return history
+
+
+def test_for_user_returns_newest_first_up_to_limit():
+    records = make_history(5).for_user("u1", limit=2)
+
+    assert [record["row_index"] for record in records] == [6, 5]
+
+
+def test_negative_limit_does_not_return_everything():
+    assert make_history(5).for_user("u1", limit=-1) == []
+
+
+def test_per_vendor_per_hour_counts_from_rollup():
+    counts = make_history(5).per_vendor_per_hour(vendor="senhas : gerente")
+
+    assert counts == [{"vendor": "Senhas : Gerente", "hour": "2023-11-14T22:00:00+00:00", "count": 5}]
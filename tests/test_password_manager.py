@@ -0,0 +1,60 @@
+import threading
+from collections import Counter
+
+from fakes import FakeSheets, make_manager, make_rows
+
+
+def test_concurrent_reserve_confirm_refresh_never_reuses_a_password():
+    sheets = FakeSheets(make_rows(["Gerente", "Supervisor"], 200))
+    manager = make_manager(sheets)
+    assigned = []
+    assigned_lock = threading.Lock()
+
+    def worker(vendor):
+        for _ in range(40):
+            reservation = manager.reserve_password(vendor)
+            if reservation is None:
+                continue
+            password_data = manager.confirm_reservation(reservation["reservation_id"])
+            if password_data:
+                with assigned_lock:
+                    assigned.append(password_data["password"])
+            manager.refresh_data(delta=True)
+
+    threads = [threading.Thread(target=worker, args=(vendor,))
+               for vendor in ["gerente", "supervisor"] * 4]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    manager.flush_pending_writes()
+
+    duplicates = [password for password, count in Counter(assigned).items() if count > 1]
+    assert duplicates == []
+    assert len(assigned) == 320
+    used = sum(1 for row in sheets.rows[1:] if row[6] == "Usada")
+    assert used == 320
+
+
+def test_pending_write_follows_its_password_after_rows_shift():
+    sheets = FakeSheets(make_rows(["Gerente"], 3))
+    manager = make_manager(sheets, write_batch_size=100, write_flush_interval=60)
+    try:
+        reservation = manager.reserve_password("gerente")
+        password_data = manager.confirm_reservation(reservation["reservation_id"])
+        assert password_data["password"] == "Gerente-0"
+
+        sheets.fail_writes = True
+        assert manager.flush_pending_writes() is False
+
+        # Linha inserida acima da senha confirmada antes do novo flush
+        sheets.insert_row(1, ["Senhas : Gerente", "NOVA-0", "", "", "", "", ""])
+        sheets.fail_writes = False
+        manager.refresh_data()
+
+        statuses = {row[1]: row[6] for row in sheets.rows[1:]}
+        assert statuses == {"NOVA-0": "", "Gerente-0": "Usada", "Gerente-1": "", "Gerente-2": ""}
+        assert manager.pending_write_count == 0
+        assert manager.get_next_password("gerente")["password"] == "NOVA-0"
+    finally:
+        manager.flush_pending_writes()
@@ -0,0 +1,60 @@
+import cProfile
+import threading
+
+import profiling
+from profiling import ProfilingController
+
+
+class SlowApp:
+    def __init__(self, barrier):
+        self.barrier = barrier
+
+    def wsgi_app(self, environ, start_response):
+        self.barrier.wait(timeout=5)
+        start_response("200 OK", [])
+        return [b"ok"]
+
+
+def test_overlapping_cprofile_requests_do_not_fail():
+    barrier = threading.Barrier(4)
+    app = SlowApp(barrier)
+    controller = ProfilingController(app, targets=[])
+    controller.start("cprofile", duration=30)
+    results, errors = [], []
+
+    def request():
+        try:
+            results.append(app.wsgi_app({}, lambda *args: None))
+        except Exception as e:
+            errors.append(e)
+
+    try:
+        threads = [threading.Thread(target=request) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        controller.stop()
+
+    assert errors == []
+    assert results == [[b"ok"]] * 4
+    assert controller.skipped_requests == 3
+    assert controller.result[0] == "cprofile"
+
+
+def test_request_runs_unprofiled_when_another_profiler_is_active(monkeypatch):
+    class BusyProfile(cProfile.Profile):
+        def enable(self, *args, **kwargs):
+            raise ValueError("Another profiling tool is already active")
+
+    monkeypatch.setattr(profiling.cProfile, "Profile", BusyProfile)
+    app = SlowApp(threading.Barrier(1))
+    controller = ProfilingController(app, targets=[])
+    controller.start("cprofile", duration=30)
+    try:
+        assert app.wsgi_app({}, lambda *args: None) == [b"ok"]
+    finally:
+        controller.stop()
+
+    assert controller.skipped_requests == 1
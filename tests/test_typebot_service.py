@@ -0,0 +1,23 @@
+from fakes import FakeSheets, make_manager, make_rows
+from typebot_service import TypebotService
+
+
+def test_reserve_with_ambiguous_vendor_returns_candidates():
+    manager = make_manager(FakeSheets(make_rows(["Vendedor Alimento", "Vendedor Medicamento"], 2)))
+
+    result = TypebotService().process_webhook({"vendor": "vendedor", "action": "reserve"}, manager)
+
+    assert result["success"] is False
+    assert result["candidates"] == ["senhas : vendedor alimento", "senhas : vendedor medicamento"]
+    assert manager._reservations == {}
+
+
+def test_reserve_then_confirm_returns_the_reserved_password():
+    manager = make_manager(FakeSheets(make_rows(["Vendedor Alimento", "Vendedor Medicamento"], 2)))
+    service = TypebotService()
+
+    reserved = service.process_webhook({"vendor": "alimento", "action": "reserve"}, manager)
+    confirmed = service.process_webhook({"action": "confirm", "reservationId": reserved["reservationId"]}, manager)
+
+    assert reserved["success"] is True
+    assert confirmed["password"] == "Vendedor Alimento-0"
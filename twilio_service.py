@@ -1,7 +1,13 @@
 import os
+import time
 import logging
-from typing import Optional
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List, Optional, Tuple
+from requests.adapters import HTTPAdapter
 from twilio.rest import Client
+from twilio.http.http_client import TwilioHttpClient
 from twilio.base.exceptions import TwilioRestException
 
 logger = logging.getLogger(__name__)
@@ -9,20 +15,74 @@ logger = logging.getLogger(__name__)
 class TwilioService:
     """Service for sending SMS messages via Twilio."""
     
-    def __init__(self):
-        """Initialize the Twilio service with credentials from environment variables."""
+    def __init__(self, pool_size: Optional[int] = None, max_concurrency: Optional[int] = None,
+                 dedup_window: Optional[float] = None, max_retries: int = 3, base_url: Optional[str] = None,
+                 max_retry_wait: float = 5.0):
+        """
+        Initialize the Twilio service with credentials from environment variables.
+        
+        Args:
+            pool_size: Keep-alive connections kept open to the Twilio API (TWILIO_POOL_SIZE, default 10)
+            max_concurrency: Maximum parallel sends in send_many (TWILIO_MAX_CONCURRENCY, default 4)
+            dedup_window: Seconds during which the same message to the same number is not resent
+                (TWILIO_DEDUP_WINDOW, default 60; 0 disables)
+            max_retries: Retries after a 429 rate-limit response
+            max_retry_wait: Maximum total seconds spent waiting on 429 retries for one message
+            base_url: Override the Twilio API URL, e.g. a local fake endpoint (TWILIO_API_BASE_URL)
+        """
         self.account_sid = os.environ.get("TWILIO_ACCOUNT_SID")
         self.auth_token = os.environ.get("TWILIO_AUTH_TOKEN")
         self.from_phone = os.environ.get("TWILIO_PHONE_NUMBER")
+        self.pool_size = pool_size or int(os.environ.get("TWILIO_POOL_SIZE", 10))
+        self.max_concurrency = max_concurrency or int(os.environ.get("TWILIO_MAX_CONCURRENCY", 4))
+        self.dedup_window = dedup_window if dedup_window is not None else float(os.environ.get("TWILIO_DEDUP_WINDOW", 60))
+        self.max_retries = max_retries
+        self.max_retry_wait = max_retry_wait
+        self.base_url = base_url or os.environ.get("TWILIO_API_BASE_URL")
         self.client = None
         
+        # (telefone, mensagem) -> _SendRecord; ordenado por instante do envio
+        self._recent = OrderedDict()
+        self._recent_lock = threading.Lock()
+        # Retry-After da última resposta recebida por esta thread
+        self._local = threading.local()
+        
         # Check if Twilio is configured
         if self.account_sid and self.auth_token and self.from_phone:
-            self.client = Client(self.account_sid, self.auth_token)
+            self.client = Client(self.account_sid, self.auth_token, http_client=self._create_http_client())
+            if self.base_url:
+                self.client.api.base_url = self.base_url.rstrip('/')
             logger.info("Twilio service initialized")
         else:
             logger.warning("Twilio service not fully configured. SMS functionality will be disabled.")
     
+    def _create_http_client(self) -> TwilioHttpClient:
+        """Create an HTTP client that reuses keep-alive connections across sends."""
+        http_client = TwilioHttpClient(
+            pool_connections=True,
+            timeout=10,
+            request_hooks={'response': self._capture_retry_after}
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+        http_client.session.mount("https://", adapter)
+        http_client.session.mount("http://", adapter)
+        return http_client
+    
+    def _capture_retry_after(self, response, *args, **kwargs):
+        """requests response hook: remember Retry-After for the sending thread."""
+        self._local.retry_after = response.headers.get('Retry-After') if response.status_code == 429 else None
+    
+    def _retry_delay(self, attempt: int) -> float:
+        """Seconds to wait before retrying: Twilio's Retry-After if present, else exponential backoff."""
+        retry_after = getattr(self._local, 'retry_after', None)
+        self._local.retry_after = None
+        if retry_after:
+            try:
+                return max(0.0, float(retry_after))
+            except ValueError:
+                pass
+        return 0.5 * (2 ** attempt)
+    
     def is_configured(self) -> bool:
         """Check if Twilio is properly configured."""
         return self.client is not None
@@ -31,32 +91,142 @@ class TwilioService:
         """
         Send an SMS message using Twilio.
         
+        The same message to the same number within dedup_window is not sent
+        again; the SID of the earlier send is returned instead, waiting for it
+        if that send is still in flight. Rate-limit (429) responses are retried
+        after Twilio's Retry-After (or exponential backoff), spending at most
+        max_retry_wait seconds waiting in total.
+        
         Args:
             to_phone: The recipient's phone number
             message: The message content
-            
+        
         Returns:
             Message SID if successful, None if failed
         """
         if not self.is_configured():
             logger.error("Twilio is not configured. Cannot send SMS.")
             return None
+        
+        # Format the phone number with + if not present
+        if not to_phone.startswith('+'):
+            to_phone = f"+{to_phone}"
+        
+        key = (to_phone, message)
+        record, claimed = self._claim(key)
+        if record is None:
+            return self._create_message(to_phone, message)
             
+        if not claimed:
+            # Envio idêntico já feito ou em andamento: usa o resultado dele
+            record.done.wait(timeout=self._inflight_timeout())
+            logger.info("Duplicate SMS suppressed", extra={"event": "sms.deduplicated", "phone": to_phone})
+            return record.sid
+        
+        sid = None
         try:
-            # Format the phone number with + if not present
-            if not to_phone.startswith('+'):
-                to_phone = f"+{to_phone}"
-                
-            message = self.client.messages.create(
-                body=message,
-                from_=self.from_phone,
-                to=to_phone
-            )
-            logger.info(f"SMS sent successfully. SID: {message.sid}")
-            return message.sid
-        except TwilioRestException as e:
-            logger.error(f"Failed to send SMS: {str(e)}")
-            return None
-        except Exception as e:
-            logger.error(f"Unexpected error sending SMS: {str(e)}")
-            return None
\ No newline at end of file
+            sid = self._create_message(to_phone, message)
+            return sid
+        finally:
+            self._settle(key, record, sid)
+    
+    def _inflight_timeout(self) -> float:
+        """Upper bound on how long a duplicate waits for the in-flight send."""
+        return 15.0 + self.max_retry_wait
+    
+    def _create_message(self, to_phone: str, message: str) -> Optional[str]:
+        """Call the Twilio API, retrying on rate-limit responses within max_retry_wait."""
+        waited = 0.0
+        for attempt in range(self.max_retries + 1):
+            try:
+                result = self.client.messages.create(
+                    body=message,
+                    from_=self.from_phone,
+                    to=to_phone
+                )
+                logger.info("SMS sent successfully. SID: %s", result.sid, extra={"event": "sms.sent"})
+                return result.sid
+            except TwilioRestException as e:
+                if e.status == 429 and attempt < self.max_retries:
+                    delay = self._retry_delay(attempt)
+                    if waited + delay <= self.max_retry_wait:
+                        logger.warning(f"Twilio rate limit hit, retrying in {delay:.1f}s")
+                        time.sleep(delay)
+                        waited += delay
+                        continue
+                    logger.error(f"Twilio rate limit hit; retry in {delay:.1f}s exceeds the retry budget")
+                    return None
+                logger.error(f"Failed to send SMS: {str(e)}")
+                return None
+            except Exception as e:
+                logger.error(f"Unexpected error sending SMS: {str(e)}")
+                return None
+        return None
+    
+    def _claim(self, key: Tuple[str, str]) -> Tuple[Optional["_SendRecord"], bool]:
+        """
+        Reserve a (phone, message) slot for sending.
+        
+        Returns:
+            (None, True) when deduplication is disabled, (record, True) if the
+            caller should send and settle the record, or (record, False) if an
+            identical message was sent or is in flight within the window
+        """
+        if self.dedup_window <= 0:
+            return None, True
+        
+        now = time.monotonic()
+        with self._recent_lock:
+            # Remove entradas expiradas (as mais antigas ficam no início)
+            while self._recent:
+                oldest = next(iter(self._recent.values()))
+                if now - oldest.started_at < self.dedup_window:
+                    break
+                self._recent.popitem(last=False)
+            
+            record = self._recent.get(key)
+            if record is not None:
+                return record, False
+            
+            record = _SendRecord(now)
+            self._recent[key] = record
+            return record, True
+    
+    def _settle(self, key: Tuple[str, str], record: "_SendRecord", sid: Optional[str]):
+        """Publish the result of a claimed send; failed sends free the slot for a retry."""
+        with self._recent_lock:
+            record.sid = sid
+            if not sid and self._recent.get(key) is record:
+                del self._recent[key]
+        record.done.set()
+    
+    def send_many(self, messages: Iterable[Tuple[str, str]]) -> List[Optional[str]]:
+        """
+        Send several SMS messages with at most max_concurrency in flight.
+        
+        Args:
+            messages: Iterable of (to_phone, message) pairs
+        
+        Returns:
+            List of message SIDs (or None for failures), in input order
+        """
+        messages = list(messages)
+        if not messages:
+            return []
+        if not self.is_configured():
+            logger.error("Twilio is not configured. Cannot send SMS.")
+            return [None] * len(messages)
+        
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(messages))) as executor:
+            return list(executor.map(lambda item: self.send_sms(*item), messages))
+
+
+class _SendRecord:
+    """Result of a (phone, message) send shared with duplicate callers."""
+    
+    __slots__ = ('started_at', 'sid', 'done')
+    
+    def __init__(self, started_at: float):
+        self.started_at = started_at
+        self.sid = None
+        self.done = threading.Event()
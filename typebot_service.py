@@ -1,6 +1,7 @@
 import logging
 from typing import Dict, Any
 from password_manager import PasswordManager
+from vendor_index import VendorMatch, AMBIGUOUS
 
 logger = logging.getLogger(__name__)
 
@@ -27,6 +28,13 @@ class TypebotService:
             if not data:
                 return {"error": "No data provided"}
                 
+            # Fluxo em duas fases: reserve -> confirm/release
+            action = data.get('action')
+            if action == 'confirm':
+                return self._confirm(data, password_manager)
+            if action == 'release':
+                return self._release(data, password_manager)
+                
             # Extract vendor information - this should match what Typebot sends
             vendor = data.get('vendor')
             user_id = data.get('userId', 'unknown')
@@ -35,8 +43,21 @@ class TypebotService:
             if not vendor:
                 return {"error": "No vendor specified"}
                 
+            match = password_manager.find_vendor(vendor)
+            if match.status == AMBIGUOUS:
+                return {
+                    "success": False,
+                    "message": f"Fornecedor '{vendor}' é ambíguo. Opções: {', '.join(match.candidates)}.",
+                    "has_password": False,
+                    "candidates": match.candidates
+                }
+                
+            if action == 'reserve':
+                return self._reserve(vendor, user_id, password_manager, match)
+                
             # Automatically assign the next password, with optional SMS delivery
-            password_data = password_manager.auto_assign_next_password(vendor, phone_number)
+            password_data = password_manager.auto_assign_next_password(vendor, phone_number, user_id=user_id,
+                                                                       match=match)
             
             # Verificar se há senhas disponíveis
             if not password_data:
@@ -77,3 +98,58 @@ class TypebotService:
                 "message": f"Erro ao processar solicitação: {str(e)}",
                 "has_password": False
             }
+    
+    def _reserve(self, vendor: str, user_id: str, password_manager: PasswordManager,
+                 match: VendorMatch) -> Dict[str, Any]:
+        """Reserve a password for the conversation without marking it as used."""
+        reservation = password_manager.reserve_password(vendor, holder=user_id, match=match)
+        if not reservation:
+            return {
+                "success": False,
+                "message": f"Todas as senhas para {vendor} já foram utilizadas. Por favor, contate o administrador.",
+                "has_password": False
+            }
+            
+        return {
+            "success": True,
+            "vendor": reservation["vendor"],
+            "reservationId": reservation["reservation_id"],
+            "expiresIn": reservation["expires_in"],
+            "has_password": False,
+            "message": f"Senha para {reservation['vendor']} reservada."
+        }
+    
+    def _confirm(self, data: Dict[str, Any], password_manager: PasswordManager) -> Dict[str, Any]:
+        """Confirm a reservation and return the password."""
+        reservation_id = data.get('reservationId')
+        phone_number = data.get('phoneNumber')
+        if not reservation_id:
+            return {"error": "No reservationId specified"}
+            
+        password_data = password_manager.confirm_reservation(reservation_id, phone_number)
+        if not password_data:
+            return {
+                "success": False,
+                "message": "Reserva expirada ou inválida. Por favor, solicite a senha novamente.",
+                "has_password": False
+            }
+            
+        response = {
+            "success": True,
+            "vendor": password_data["vendor"],
+            "password": password_data["password"],
+            "has_password": True,
+            "message": f"Senha para {password_data['vendor']} enviada com sucesso!"
+        }
+        if phone_number:
+            response["sms_status"] = "sent" if password_data.get('sms_sent') else "failed"
+        return response
+    
+    def _release(self, data: Dict[str, Any], password_manager: PasswordManager) -> Dict[str, Any]:
+        """Release a reservation when the conversation is abandoned."""
+        reservation_id = data.get('reservationId')
+        if not reservation_id:
+            return {"error": "No reservationId specified"}
+            
+        released = password_manager.release_reservation(reservation_id)
+        return {"success": released, "has_password": False}
@@ -0,0 +1,203 @@
+import bisect
+import logging
+import re
+import unicodedata
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Prefixo usado na coluna A da planilha ("Senhas : Supervisor")
+_PREFIX_RE = re.compile(r'^\s*senhas?\s*:\s*', re.IGNORECASE)
+_WHITESPACE_RE = re.compile(r'\s+')
+
+FOUND = "found"
+AMBIGUOUS = "ambiguous"
+NOT_FOUND = "not_found"
+
+
+def normalize_vendor(name: str) -> str:
+    """
+    Normalize a vendor name for lookups.
+
+    Strips accents, the "Senhas :" prefix, surrounding punctuation and
+    repeated whitespace, and lowercases the result.
+
+    Args:
+        name: Raw vendor name (sheet cell text or request payload)
+
+    Returns:
+        Normalized vendor key
+    """
+    if not name:
+        return ""
+    text = unicodedata.normalize('NFKD', str(name))
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    text = _PREFIX_RE.sub('', text)
+    text = _WHITESPACE_RE.sub(' ', text).strip(' :-').lower()
+    return text
+
+
+class VendorMatch:
+    """Result of a vendor lookup."""
+
+    __slots__ = ('status', 'key', 'candidates', 'query')
+
+    def __init__(self, status: str, query: str, key: Optional[str] = None, candidates: Optional[List[str]] = None):
+        self.status = status
+        self.query = query
+        self.key = key
+        self.candidates = candidates or []
+
+    def __bool__(self) -> bool:
+        return self.status == FOUND
+
+    def to_dict(self) -> Dict[str, object]:
+        return {
+            "status": self.status,
+            "query": self.query,
+            "vendor": self.key,
+            "candidates": self.candidates,
+        }
+
+
+class VendorIndex:
+    """
+    Precomputed lookup index from vendor names to `vendor_map` keys.
+
+    Resolution order is: raw key, normalized name, alias, then prefix of the
+    name or of any word in it (so "Medicamento" finds "Senhas : Vendedor
+    Medicamento"). Exact lookups are dict hits; prefix lookups are a binary
+    search over a sorted list of name suffixes.
+    """
+
+    def __init__(self, aliases: Optional[Dict[str, str]] = None, max_candidates: int = 10):
+        """
+        Initialize the vendor index.
+
+        Args:
+            aliases: Optional mapping of alias -> vendor name
+            max_candidates: Maximum number of candidates reported for ambiguous matches
+        """
+        self.max_candidates = max_candidates
+        self.raw_keys = set()
+        self.normalized = {}   # normalized name -> list of raw keys
+        self.aliases = {}      # normalized alias -> normalized vendor name
+        self._entries = []     # sorted (suffix, normalized name) tuples for prefix search
+        for alias, vendor in (aliases or {}).items():
+            self.add_alias(alias, vendor)
+
+    def add_alias(self, alias: str, vendor: str):
+        """
+        Register an alias for a vendor.
+
+        Args:
+            alias: Alternative name accepted in lookups
+            vendor: Vendor name the alias points to (raw or normalized)
+        """
+        alias_key = normalize_vendor(alias)
+        if alias_key:
+            self.aliases[alias_key] = normalize_vendor(vendor)
+
+    def update(self, raw_keys: Iterable[str]):
+        """
+        Bring the index in line with the current set of `vendor_map` keys.
+
+        Only vendors that were added or removed since the last call are
+        re-normalized; unchanged vendors keep their entries.
+
+        Args:
+            raw_keys: Current `vendor_map` keys
+        """
+        current = set(raw_keys)
+        added = current - self.raw_keys
+        removed = self.raw_keys - current
+        if not added and not removed:
+            return
+
+        for raw_key in removed:
+            norm = normalize_vendor(raw_key)
+            keys = self.normalized.get(norm)
+            if keys is None:
+                continue
+            if raw_key in keys:
+                keys.remove(raw_key)
+            if not keys:
+                del self.normalized[norm]
+                for entry in self._suffixes(norm):
+                    self._remove_entry(entry)
+
+        for raw_key in added:
+            norm = normalize_vendor(raw_key)
+            if not norm:
+                continue
+            if norm not in self.normalized:
+                self.normalized[norm] = []
+                for entry in self._suffixes(norm):
+                    bisect.insort(self._entries, entry)
+            self.normalized[norm].append(raw_key)
+
+        self.raw_keys = current
+        logger.debug(f"Vendor index updated: +{len(added)} -{len(removed)}, {len(self.normalized)} vendors")
+
+    def lookup(self, name: str) -> VendorMatch:
+        """
+        Resolve a vendor name to a `vendor_map` key.
+
+        Args:
+            name: Vendor name as sent by the client
+
+        Returns:
+            VendorMatch with status "found", "ambiguous" or "not_found"
+        """
+        if not name:
+            return VendorMatch(NOT_FOUND, name or "")
+
+        raw_key = name.lower()
+        if raw_key in self.raw_keys:
+            return VendorMatch(FOUND, name, key=raw_key)
+
+        norm = normalize_vendor(name)
+        if not norm:
+            return VendorMatch(NOT_FOUND, name)
+
+        if norm in self.normalized:
+            return self._resolve(name, [norm])
+
+        alias_target = self.aliases.get(norm)
+        if alias_target is not None and alias_target in self.normalized:
+            return self._resolve(name, [alias_target])
+
+        return self._resolve(name, self._prefix_matches(norm))
+
+    def _resolve(self, query: str, names: List[str]) -> VendorMatch:
+        raw_keys = []
+        for norm in names:
+            raw_keys.extend(self.normalized.get(norm, []))
+        if not raw_keys:
+            return VendorMatch(NOT_FOUND, query)
+        if len(raw_keys) == 1:
+            return VendorMatch(FOUND, query, key=raw_keys[0])
+        return VendorMatch(AMBIGUOUS, query, candidates=sorted(raw_keys)[:self.max_candidates])
+
+    def _prefix_matches(self, prefix: str) -> List[str]:
+        matches = []
+        i = bisect.bisect_left(self._entries, (prefix, ''))
+        while i < len(self._entries) and self._entries[i][0].startswith(prefix):
+            norm = self._entries[i][1]
+            if norm not in matches:
+                matches.append(norm)
+                # Um candidato a mais já basta para saber que é ambíguo
+                if len(matches) > self.max_candidates:
+                    break
+            i += 1
+        return matches
+
+    def _remove_entry(self, entry: Tuple[str, str]):
+        i = bisect.bisect_left(self._entries, entry)
+        if i < len(self._entries) and self._entries[i] == entry:
+            del self._entries[i]
+
+    @staticmethod
+    def _suffixes(norm: str) -> List[Tuple[str, str]]:
+        words = norm.split(' ')
+        return [(' '.join(words[i:]), norm) for i in range(len(words))]